@@ -1,10 +1,9 @@
-from sqlalchemy import create_engine, event
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy_utils import database_exists, create_database
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 import os
 from dotenv import load_dotenv
-from app.models.models import Base
 
 # 加载环境变量
 load_dotenv()
@@ -16,43 +15,63 @@ DB_USER = os.getenv("DB_USER", "root")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "123456")
 DB_NAME = os.getenv("DB_NAME", "course_scheduling")
 
-print(f"数据库配置: HOST={DB_HOST}, PORT={DB_PORT}, USER={DB_USER}, DB={DB_NAME}")
+# 数据库URL：可以用 DATABASE_URL 直接指定（例如 sqlite:///./dev.db），不指定时由上面的 DB_* 拼出 MySQL 地址
+SQLALCHEMY_DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+)
 
-# 创建数据库URL
-SQLALCHEMY_DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# 异步接口使用的驱动；ASYNC_DATABASE_URL 未指定时把同步URL的驱动换成对应的异步驱动
+ASYNC_DRIVERS = {"mysql": "aiomysql", "sqlite": "aiosqlite", "postgresql": "asyncpg"}
 
-print(f"数据库URL: {SQLALCHEMY_DATABASE_URL}")
+# SQL 语句日志，调试时设置 SQL_ECHO=1 打开
+SQL_ECHO = os.getenv("SQL_ECHO", "0") == "1"
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
 
-# 创建数据库引擎
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    pool_size=5,
-    max_overflow=10,
-    echo=True  # 启用SQL语句日志
-)
+def _async_url(url):
+    """把同步URL的驱动换成同一数据库的异步驱动"""
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"没有 {backend} 的异步驱动，请设置 ASYNC_DATABASE_URL")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
 
-# 添加数据库引擎事件监听器
-@event.listens_for(engine, "connect")
-def receive_connect(dbapi_connection, connection_record):
-    print("数据库连接成功!")
+def _engine_options(url) -> dict:
+    """连接池参数；SQLite 不使用连接池参数，并允许跨线程使用连接（同步接口在线程池中执行）"""
+    if url.get_backend_name() == "sqlite":
+        return {"connect_args": {"check_same_thread": False}, "echo": SQL_ECHO}
+    return {
+        "pool_pre_ping": True,
+        "pool_recycle": 3600,
+        "pool_size": POOL_SIZE,
+        "max_overflow": 10,
+        "echo": SQL_ECHO,
+    }
 
-@event.listens_for(engine, "checkout")
-def receive_checkout(dbapi_connection, connection_record, connection_proxy):
-    print("获取数据库连接!")
+# 创建数据库引擎；create_engine 不会连接数据库，导入本模块没有任何 I/O，
+# 连接池由启动流程（app/startup.py）在后台预热，建库建表由 scripts/migrate.py 负责
+database_url = make_url(SQLALCHEMY_DATABASE_URL)
+engine = create_engine(database_url, **_engine_options(database_url))
 
-# 如果数据库不存在，则创建
-if not database_exists(engine.url):
-    print(f"数据库 {DB_NAME} 不存在，正在创建...")
-    create_database(engine.url)
-    print(f"数据库 {DB_NAME} 创建成功!")
+def ensure_database():
+    """数据库不存在时创建（只在迁移时调用，sqlalchemy_utils 导入较慢，不放在模块顶层）"""
+    from sqlalchemy_utils import database_exists, create_database
+    if not database_exists(engine.url):
+        print(f"数据库 {engine.url.database} 不存在，正在创建...")
+        create_database(engine.url)
+        print(f"数据库 {engine.url.database} 创建成功!")
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# 创建基类
-Base = declarative_base()
+# 异步数据库引擎，供 async 接口使用（MySQL 使用 aiomysql 驱动）；
+# 驱动默认由同步URL推出，也可以用 ASYNC_DATABASE_URL 单独指定
+async_database_url = make_url(os.getenv("ASYNC_DATABASE_URL") or _async_url(database_url))
+async_engine = create_async_engine(async_database_url, **_engine_options(async_database_url))
+
+# 异步会话工厂；提交后不让对象过期，避免在返回响应时触发隐式的同步加载
+AsyncSessionLocal = sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 
 def get_db():
     """获取数据库会话"""
@@ -62,9 +81,7 @@ def get_db():
     finally:
         db.close()
 
-# 创建所有表
-def create_tables():
-    """创建数据库表"""
-    print("正在创建数据库表...")
-    Base.metadata.create_all(bind=engine)
-    print("数据库表创建成功!")
\ No newline at end of file
+async def get_async_db():
+    """获取异步数据库会话"""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,3 @@
+from .runner import run_migrations, current_version, pending_migrations
+
+__all__ = ['run_migrations', 'current_version', 'pending_migrations']
@@ -0,0 +1,82 @@
+"""
+数据库版本迁移
+
+每个迁移是本包中名为 vNNNN_说明.py 的模块，定义 VERSION、DESCRIPTION 和 upgrade(conn)。
+已执行的版本记录在 schema_migrations 表中，运行 scripts/migrate.py 时（或设置了
+RUN_MIGRATIONS_ON_STARTUP 的进程启动时）按版本号顺序执行尚未执行的迁移，每个迁移在单独的事务中执行。
+MySQL 的 DDL 会隐式提交事务，所以 upgrade 需要写成可重复执行的（先检查再创建）。
+"""
+import importlib
+import pkgutil
+import re
+from datetime import datetime
+from types import ModuleType
+from typing import List, Optional
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select
+from sqlalchemy.engine import Engine
+
+_MODULE_PATTERN = re.compile(r'^v(\d+)_\w+$')
+
+_metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations', _metadata,
+    Column('version', Integer, primary_key=True, autoincrement=False),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def _migrations() -> List[ModuleType]:
+    """按版本号排序的全部迁移模块"""
+    package = __name__.rsplit('.', 1)[0]
+    path = importlib.import_module(package).__path__
+    modules = [
+        importlib.import_module(f'{package}.{info.name}')
+        for info in pkgutil.iter_modules(path)
+        if _MODULE_PATTERN.match(info.name)
+    ]
+    modules.sort(key=lambda module: module.VERSION)
+    versions = [module.VERSION for module in modules]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f'迁移版本号重复: {versions}')
+    return modules
+
+
+def _applied_versions(engine: Engine) -> set:
+    with engine.connect() as conn:
+        if not inspect(conn).has_table(schema_migrations.name):
+            return set()
+        return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def current_version(engine: Engine) -> int:
+    """数据库当前的版本号，没有执行过任何迁移时为 0"""
+    return max(_applied_versions(engine), default=0)
+
+
+def pending_migrations(engine: Engine) -> List[ModuleType]:
+    """尚未执行的迁移"""
+    applied = _applied_versions(engine)
+    return [module for module in _migrations() if module.VERSION not in applied]
+
+
+def run_migrations(engine: Engine, target: Optional[int] = None) -> List[int]:
+    """执行尚未执行的迁移（指定 target 时只执行到该版本），返回本次执行的版本号"""
+    _metadata.create_all(engine, checkfirst=True)
+    done = []
+    for module in pending_migrations(engine):
+        if target is not None and module.VERSION > target:
+            break
+        print(f"正在执行数据库迁移 {module.VERSION}: {module.DESCRIPTION}")
+        with engine.begin() as conn:
+            module.upgrade(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=module.VERSION,
+                description=module.DESCRIPTION,
+                applied_at=datetime.now()
+            ))
+        done.append(module.VERSION)
+    if done:
+        print(f"数据库已迁移到版本 {done[-1]}")
+    return done
@@ -0,0 +1,47 @@
+"""初始表结构：教师、课程、教室、课表（与引入迁移之前的模型一致，已存在的表会跳过）"""
+from sqlalchemy import Column, Float, ForeignKey, Integer, MetaData, String, Table
+
+VERSION = 1
+DESCRIPTION = '创建教师、课程、教室和课表'
+
+# 固定为本版本的表结构，之后模型的改动通过新的迁移完成
+metadata = MetaData()
+
+Table(
+    'teachers', metadata,
+    Column('id', Integer, primary_key=True, index=True),
+    Column('name', String(50), nullable=False),
+    Column('title', String(50)),
+    Column('department', String(50)),
+)
+
+Table(
+    'courses', metadata,
+    Column('id', Integer, primary_key=True, index=True),
+    Column('name', String(100), nullable=False),
+    Column('code', String(20), unique=True, nullable=False),
+    Column('credits', Float, nullable=False),
+    Column('hours', Integer, nullable=False),
+)
+
+Table(
+    'classrooms', metadata,
+    Column('id', Integer, primary_key=True, index=True),
+    Column('name', String(50), unique=True, nullable=False),
+    Column('capacity', Integer, nullable=False),
+    Column('building', String(50)),
+)
+
+Table(
+    'schedules', metadata,
+    Column('id', Integer, primary_key=True, index=True),
+    Column('course_id', Integer, ForeignKey('courses.id'), nullable=False),
+    Column('teacher_id', Integer, ForeignKey('teachers.id'), nullable=False),
+    Column('classroom_id', Integer, ForeignKey('classrooms.id'), nullable=False),
+    Column('day', Integer, nullable=False),
+    Column('period', Integer, nullable=False),
+)
+
+
+def upgrade(conn):
+    metadata.create_all(conn, checkfirst=True)
@@ -0,0 +1,82 @@
+"""
+课表的组合索引和唯一约束
+(day, period, classroom_id)、(day, period, teacher_id) 唯一：同一时间同一教室或同一教师只能有一条排课，
+冲突检查是唯一索引上的等值查找；(classroom_id, day, period)、(teacher_id, day, period)
+用于按教室或教师查询课表。
+"""
+import os
+from typing import Dict, List
+
+from sqlalchemy import bindparam, inspect, text
+
+VERSION = 2
+DESCRIPTION = '课表时间槽唯一约束与按教室/教师查询的索引'
+
+INDEXES = [
+    ('uq_schedules_room_slot', ('day', 'period', 'classroom_id'), True),
+    ('uq_schedules_teacher_slot', ('day', 'period', 'teacher_id'), True),
+    ('ix_schedules_classroom_timetable', ('classroom_id', 'day', 'period'), False),
+    ('ix_schedules_teacher_timetable', ('teacher_id', 'day', 'period'), False),
+]
+
+# 已有数据中同一时间同一教室（教师）有多条排课时，默认中止迁移并列出这些排课，由管理员处理；
+# 设置 MIGRATE_DROP_DOUBLE_BOOKINGS=1 时每组只保留ID最小的一条，删除其余的并打印它们的ID
+DROP_DOUBLE_BOOKINGS = os.getenv("MIGRATE_DROP_DOUBLE_BOOKINGS", "0") == "1"
+# 中止时最多列出的冲突组数
+_REPORT_LIMIT = 50
+
+
+def _double_bookings(conn, column: str) -> List[Dict]:
+    """同一时间同一教室（教师）的多条排课，每组为 {'day', 'period', column, 'ids'}，ids 从小到大"""
+    rows = conn.execute(text(
+        f"SELECT s.day, s.period, s.{column}, s.id FROM schedules s JOIN ("
+        f"SELECT day, period, {column} FROM schedules GROUP BY day, period, {column} HAVING COUNT(*) > 1"
+        f") dup ON s.day = dup.day AND s.period = dup.period AND s.{column} = dup.{column} "
+        f"ORDER BY s.day, s.period, s.{column}, s.id"
+    ))
+    groups: Dict[tuple, List[int]] = {}
+    for day, period, key, schedule_id in rows:
+        groups.setdefault((day, period, key), []).append(schedule_id)
+    return [{'day': day, 'period': period, column: key, 'ids': ids}
+            for (day, period, key), ids in groups.items()]
+
+
+def _describe(column: str, groups: List[Dict]) -> List[str]:
+    noun = '教室' if column == 'classroom_id' else '教师'
+    return [f"周{group['day']}第{group['period']}节 {noun} {group[column]}: 排课 {group['ids']}" for group in groups]
+
+
+def upgrade(conn):
+    inspector = inspect(conn)
+    existing = {index['name'] for index in inspector.get_indexes('schedules')}
+    existing |= {constraint['name'] for constraint in inspector.get_unique_constraints('schedules')}
+    unique_columns = [columns[-1] for name, columns, unique in INDEXES if unique and name not in existing]
+
+    if not DROP_DOUBLE_BOOKINGS:
+        # 先检查全部唯一约束再建索引，中止时不会留下只建了一半的索引
+        lines = []
+        for column in unique_columns:
+            lines.extend(_describe(column, _double_bookings(conn, column)))
+        if lines:
+            shown = lines[:_REPORT_LIMIT]
+            if len(lines) > len(shown):
+                shown.append(f"……共 {len(lines)} 组")
+            raise RuntimeError(
+                "课表中有重复占用时间槽的排课，无法创建唯一约束。请调整或删除以下排课后重新迁移，"
+                "或设置 MIGRATE_DROP_DOUBLE_BOOKINGS=1 每组只保留ID最小的一条：\n" + "\n".join(shown)
+            )
+
+    for name, columns, unique in INDEXES:
+        if name in existing:
+            continue
+        if unique:
+            # 只有设置了 MIGRATE_DROP_DOUBLE_BOOKINGS 时这里才会有重复
+            groups = _double_bookings(conn, columns[-1])
+            removed = sorted(schedule_id for group in groups for schedule_id in group['ids'][1:])
+            if removed:
+                conn.execute(text("DELETE FROM schedules WHERE id IN :ids").bindparams(
+                    bindparam('ids', expanding=True)), {'ids': removed})
+                print(f"创建 {name} 前删除了 {len(removed)} 条重复占用时间槽的排课: {removed}")
+        conn.execute(text(
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON schedules ({', '.join(columns)})"
+        ))
@@ -0,0 +1,22 @@
+"""教室排课数量统计表，创建后按现有课表填充"""
+from sqlalchemy import Column, Integer, MetaData, Table, text
+
+VERSION = 3
+DESCRIPTION = '教室排课数量统计表'
+
+metadata = MetaData()
+
+Table(
+    'classroom_stats', metadata,
+    Column('classroom_id', Integer, primary_key=True, autoincrement=False),
+    Column('schedule_count', Integer, nullable=False, default=0),
+)
+
+
+def upgrade(conn):
+    metadata.create_all(conn, checkfirst=True)
+    conn.execute(text("DELETE FROM classroom_stats"))
+    conn.execute(text(
+        "INSERT INTO classroom_stats (classroom_id, schedule_count) "
+        "SELECT classroom_id, COUNT(*) FROM schedules GROUP BY classroom_id"
+    ))
@@ -0,0 +1,24 @@
+"""响应缓存的数据版本号表，多个工作进程共享，每类数据一行"""
+from sqlalchemy import Column, Integer, MetaData, String, Table, text
+
+VERSION = 4
+DESCRIPTION = '响应缓存的数据版本号表'
+
+ENTITIES = ('teachers', 'courses', 'classrooms', 'schedules')
+
+metadata = MetaData()
+
+Table(
+    'cache_versions', metadata,
+    Column('entity', String(50), primary_key=True),
+    Column('version', Integer, nullable=False, default=0),
+)
+
+
+def upgrade(conn):
+    metadata.create_all(conn, checkfirst=True)
+    existing = {row[0] for row in conn.execute(text("SELECT entity FROM cache_versions"))}
+    for entity in ENTITIES:
+        if entity not in existing:
+            conn.execute(text("INSERT INTO cache_versions (entity, version) VALUES (:entity, 0)"),
+                         {'entity': entity})
@@ -1,3 +1,3 @@
-from .models import Base, Teacher, Course, Classroom, Schedule
+from .models import Base, Teacher, Course, Classroom, Schedule, ClassroomStats, CacheVersion
 
-__all__ = ['Base', 'Teacher', 'Course', 'Classroom', 'Schedule'] 
\ No newline at end of file
+__all__ = ['Base', 'Teacher', 'Course', 'Classroom', 'Schedule', 'ClassroomStats', 'CacheVersion'] 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -37,6 +37,15 @@ class Classroom(Base):
 
 class Schedule(Base):
     __tablename__ = "schedules"
+    # 表结构变更需要同时在 app/migrations 中添加迁移
+    __table_args__ = (
+        # 同一时间同一教室、同一教师只能有一条排课
+        Index("uq_schedules_room_slot", "day", "period", "classroom_id", unique=True),
+        Index("uq_schedules_teacher_slot", "day", "period", "teacher_id", unique=True),
+        # 按教室、教师查询课表
+        Index("ix_schedules_classroom_timetable", "classroom_id", "day", "period"),
+        Index("ix_schedules_teacher_timetable", "teacher_id", "day", "period"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
@@ -47,4 +56,18 @@ class Schedule(Base):
 
     course = relationship("Course", back_populates="schedules")
     teacher = relationship("Teacher", back_populates="schedules")
-    classroom = relationship("Classroom", back_populates="schedules") 
\ No newline at end of file
+    classroom = relationship("Classroom", back_populates="schedules")
+
+class ClassroomStats(Base):
+    """每个教室的排课数量，随课表的修改增量更新（见 app/services/classroom_stats.py）"""
+    __tablename__ = "classroom_stats"
+
+    classroom_id = Column(Integer, primary_key=True, autoincrement=False)
+    schedule_count = Column(Integer, nullable=False, default=0)
+
+class CacheVersion(Base):
+    """各类数据的版本号，写操作后加一；多个进程的响应缓存据此判断缓存是否失效（见 app/services/response_cache.py）"""
+    __tablename__ = "cache_versions"
+
+    entity = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -2,6 +2,8 @@ from pydantic import BaseModel, Field, validator
 from typing import Optional, List
 from datetime import datetime
 
+from app.services.occupancy import DAYS_PER_WEEK, PERIODS_PER_DAY
+
 class ClassroomBase(BaseModel):
     """教室基础模型"""
     name: str = Field(..., min_length=1, max_length=50, description="教室名称")
@@ -26,6 +28,80 @@ class ClassroomResponse(ClassroomBase):
     class Config:
         orm_mode = True
 
-class ClassroomImportResponse(BaseModel):
+class ImportRowError(BaseModel):
+    """导入失败的一行"""
+    line: int = Field(..., description="CSV文件中的行号（表头为第1行）")
+    error: str
+
+class ImportResponse(BaseModel):
+    """CSV导入响应模型"""
+    message: str
+    inserted: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
+    errors_truncated: bool = Field(False, description="错误行太多时只报告前一部分")
+
+class ClassroomImportResponse(ImportResponse):
     """教室导入响应模型"""
-    message: str 
\ No newline at end of file
+    pass
+
+class ScheduleGenerateParams(BaseModel):
+    """自动排课参数"""
+    engine: str = Field("greedy", regex="^(greedy|csp)$", description="排课引擎：greedy 或 csp")
+    time_limit: float = Field(5.0, gt=0, description="csp 引擎的求解时间上限（秒）")
+    runs: int = Field(1, ge=1, description="并行排课次数，保留得分最高的结果")
+    seed: Optional[int] = Field(None, description="随机种子，用于复现排课结果")
+    workers: Optional[int] = Field(None, ge=1, description="并行排课使用的进程数")
+    optimize_time: float = Field(0, ge=0, description="局部搜索优化时间（秒）")
+
+class TimeSlot(BaseModel):
+    """周课表网格内的时间槽"""
+    day: int = Field(..., ge=1, le=DAYS_PER_WEEK, description="星期几")
+    period: int = Field(..., ge=1, le=PERIODS_PER_DAY, description="第几节课")
+
+class ScheduleRepairRequest(BaseModel):
+    """增量修复课表请求"""
+    classroom_id: Optional[int] = Field(None, description="不再可用的教室")
+    teacher_id: Optional[int] = Field(None, description="不可用的教师")
+    unavailable_slots: List[TimeSlot] = Field([], description="教师不可用的时间槽，为空表示完全不可用")
+
+class ListParams(BaseModel):
+    """列表接口的分页和字段选择参数"""
+    limit: Optional[int] = Field(None, ge=1, le=1000, description="每页条数，不指定时返回全部")
+    after: Optional[int] = Field(None, description="游标：只返回ID大于该值的记录（上一页响应头 X-Next-Cursor 的值）")
+    fields: Optional[str] = Field(None, description="只返回指定字段，逗号分隔，例如 id,name")
+
+class SlotCandidate(TimeSlot):
+    """候选位置：把排课 id（不指定时表示新增）放到 (day, period, 教室, 教师)"""
+    id: Optional[int] = Field(None, description="被调整的排课，它原来的位置不算冲突")
+    teacher_id: int
+    classroom_id: int
+
+class ConflictCheckRequest(BaseModel):
+    """批量冲突检查"""
+    candidates: List[SlotCandidate] = Field(..., max_items=10000, description="候选位置，各自独立与已提交的课表比较")
+
+class ScheduleUpdateItem(BaseModel):
+    """调整一条排课：带 id 时更新（未给出的字段保持不变），不带 id 时新增，全部字段必填"""
+    id: Optional[int] = Field(None, description="被调整的排课，不指定时新增")
+    course_id: Optional[int] = None
+    teacher_id: Optional[int] = None
+    classroom_id: Optional[int] = None
+    day: Optional[int] = Field(None, ge=1, le=DAYS_PER_WEEK, description="星期几")
+    period: Optional[int] = Field(None, ge=1, le=PERIODS_PER_DAY, description="第几节课")
+
+class BatchOperation(BaseModel):
+    """批量调整中的一个操作：move 修改一条排课的指定字段，swap 交换两条排课的时间和教室"""
+    op: str = Field("move", regex="^(move|swap)$")
+    id: int = Field(..., description="被调整的排课")
+    other_id: Optional[int] = Field(None, description="swap：与之交换的排课")
+    course_id: Optional[int] = None
+    teacher_id: Optional[int] = None
+    classroom_id: Optional[int] = None
+    day: Optional[int] = Field(None, ge=1, le=DAYS_PER_WEEK, description="星期几")
+    period: Optional[int] = Field(None, ge=1, le=PERIODS_PER_DAY, description="第几节课")
+
+class BatchMoveRequest(BaseModel):
+    """批量调整：按顺序执行全部操作，只检查最终状态，全部成功或全部不执行"""
+    operations: List[BatchOperation] = Field(..., min_items=1, max_items=5000)
@@ -1,14 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, status
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import select
 from typing import List, Dict, Any
-import csv
-import io
 from pydantic import BaseModel
 
-from app.config import get_db
-from app.models.models import Classroom as ClassroomModel
-from app.models.schemas import ClassroomCreate, ClassroomUpdate, ClassroomResponse, ClassroomImportResponse
+from app.config import SessionLocal, get_db
+from app.models.models import Classroom as ClassroomModel, ClassroomStats
+from app.services import classroom_stats
+from app.services.export import export_response
+from app.services.problem import problem_cache
+from app.models.schemas import ClassroomCreate, ClassroomUpdate, ClassroomResponse, ClassroomImportResponse, ListParams
+from app.services.pagination import list_page
+from app.services.repair import repair_schedule
+from app.services.csv_import import ImportFormatError, import_csv, import_message
 
 router = APIRouter()
 
@@ -27,9 +31,9 @@ class Classroom(ClassroomBase):
         orm_mode = True
 
 @router.get("/", response_model=List[Classroom])
-def get_classrooms(db: Session = Depends(get_db)):
-    """获取所有教室列表"""
-    return db.query(ClassroomModel).all()
+def get_classrooms(params: ListParams = Depends(), db: Session = Depends(get_db)):
+    """获取教室列表，支持游标分页（limit、after）和字段选择（fields）"""
+    return list_page(db, ClassroomModel, Classroom.__fields__, params)
 
 @router.post("/", response_model=Classroom)
 def create_classroom(classroom: ClassroomCreate, db: Session = Depends(get_db)):
@@ -38,8 +42,17 @@ def create_classroom(classroom: ClassroomCreate, db: Session = Depends(get_db)):
     db.add(db_classroom)
     db.commit()
     db.refresh(db_classroom)
+    problem_cache.upsert("classrooms", db_classroom)
     return db_classroom
 
+@router.get("/export")
+def export_classrooms(fmt: str = Query("csv", alias="format", regex="^(csv|xlsx)$")):
+    """流式导出教室数据（CSV 或 XLSX），列名与导入格式一致"""
+    statement = select(
+        ClassroomModel.id, ClassroomModel.name, ClassroomModel.capacity, ClassroomModel.building
+    ).order_by(ClassroomModel.id)
+    return export_response(SessionLocal, statement, ["id", "name", "capacity", "building"], "classrooms", fmt)
+
 @router.get("/{classroom_id}", response_model=Classroom)
 def get_classroom(classroom_id: int, db: Session = Depends(get_db)):
     """获取指定教室信息"""
@@ -60,6 +73,7 @@ def update_classroom(classroom_id: int, classroom: ClassroomCreate, db: Session
     
     db.commit()
     db.refresh(db_classroom)
+    problem_cache.upsert("classrooms", db_classroom)
     return db_classroom
 
 @router.delete("/{classroom_id}")
@@ -69,13 +83,35 @@ def delete_classroom(classroom_id: int, db: Session = Depends(get_db)):
     if not classroom:
         raise HTTPException(status_code=404, detail="教室不存在")
     
+    # 先把该教室的课程迁移到其他教室，其余课表保持不变
+    repair = repair_schedule(db, classroom_id=classroom_id, commit=False)
+    db.query(ClassroomStats).filter(ClassroomStats.classroom_id == classroom_id).delete(synchronize_session=False)
     db.delete(classroom)
     db.commit()
-    return {"message": "教室已删除"}
+    problem_cache.remove("classrooms", classroom_id)
+    return {"message": "教室已删除", "repair": repair}
+
+def _parse_classroom(row: dict) -> dict:
+    """校验并转换一行教室数据"""
+    name = (row['name'] or '').strip()
+    if not name or len(name) > 50:
+        raise ValueError(f"教室名称无效: {name}")
+    
+    try:
+        capacity = int(row.get('capacity') or 50)
+    except ValueError:
+        raise ValueError(f"教室容量不是整数: {row.get('capacity')}")
+    if capacity <= 0:
+        raise ValueError(f"教室容量必须大于0: {capacity}")
+    
+    building = (row.get('building') or '').strip()
+    if not building or len(building) > 50:
+        raise ValueError(f"建筑名称无效: {building}")
+    return {"name": name, "capacity": capacity, "building": building}
 
 @router.post("/import", response_model=ClassroomImportResponse)
-async def import_classrooms(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    """从CSV文件导入教室数据"""
+def import_classrooms(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    """从CSV文件导入教室数据，按教室名称更新已有教室，逐行报告无效数据"""
     if not file.filename.endswith('.csv'):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -83,117 +119,24 @@ async def import_classrooms(file: UploadFile = File(...), db: Session = Depends(
         )
     
     try:
-        content = await file.read()
-        csv_data = content.decode('utf-8-sig')
-        csv_reader = csv.DictReader(io.StringIO(csv_data))
-        
-        # 验证CSV文件格式
-        required_fields = ['name', 'capacity', 'building']
-        for field in required_fields:
-            if field not in csv_reader.fieldnames:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"CSV文件缺少必要字段: {field}"
-                )
-        
-        classrooms = []
-        for row in csv_reader:
-            try:
-                # 验证数据
-                if not row['name'] or len(row['name']) > 50:
-                    raise ValueError(f"教室名称无效: {row['name']}")
-                
-                capacity = int(row.get('capacity', 50))
-                if capacity <= 0:
-                    raise ValueError(f"教室容量必须大于0: {capacity}")
-                
-                if not row.get('building') or len(row.get('building', '')) > 50:
-                    raise ValueError(f"建筑名称无效: {row.get('building', '')}")
-                
-                classroom = ClassroomModel(
-                    name=row['name'],
-                    capacity=capacity,
-                    building=row.get('building', '')
-                )
-                classrooms.append(classroom)
-            except ValueError as e:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"CSV数据验证失败: {str(e)}"
-                )
-        
-        # 检查教室名称是否重复
-        classroom_names = [c.name for c in classrooms]
-        if len(classroom_names) != len(set(classroom_names)):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="CSV文件中存在重复的教室名称"
-            )
-        
-        # 检查教室名称是否已存在于数据库
-        existing_names = [c.name for c in db.query(ClassroomModel).filter(ClassroomModel.name.in_(classroom_names)).all()]
-        if existing_names:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"以下教室名称已存在: {', '.join(existing_names)}"
-            )
-        
-        db.add_all(classrooms)
-        db.commit()
-        return {"message": f"成功导入 {len(classrooms)} 条教室数据"}
-    except HTTPException:
-        raise
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+        result = import_csv(db, file.file, ClassroomModel, _parse_classroom,
+                            required=['name', 'capacity', 'building'], key='name')
+    except ImportFormatError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    finally:
+        problem_cache.invalidate()
+    return {"message": import_message(result, "教室"), **result}
 
+# 前端请求的路径带结尾斜杠，两种写法都注册，避免落到 main.py 的通配路由
 @router.get("/stats/usage", response_model=Dict[str, Any])
+@router.get("/stats/usage/", response_model=Dict[str, Any], include_in_schema=False)
 def get_classroom_usage_stats(db: Session = Depends(get_db)):
-    """获取教室使用情况统计"""
+    """获取教室使用情况统计（教室 LEFT JOIN 课表，一条 GROUP BY 查询；启用统计表时直接读统计表）"""
     try:
-        # 获取所有教室
-        classrooms = db.query(ClassroomModel).all()
-        
-        # 获取每个教室的课程安排数量
-        schedule_counts = db.query(
-            Schedule.classroom_id,
-            func.count(Schedule.id).label('schedule_count')
-        ).group_by(Schedule.classroom_id).all()
-        
-        # 将课程安排数量转换为字典
-        schedule_count_dict = {item.classroom_id: item.schedule_count for item in schedule_counts}
-        
-        # 计算总课程安排数量
-        total_schedules = sum(schedule_count_dict.values())
-        
-        # 计算教室使用率
-        classroom_count = len(classrooms)
-        usage_stats = {
-            "total_classrooms": classroom_count,
-            "total_schedules": total_schedules,
-            "average_schedules_per_classroom": total_schedules / classroom_count if classroom_count > 0 else 0,
-            "classroom_details": []
-        }
-        
-        # 添加每个教室的详细信息
-        for classroom in classrooms:
-            schedule_count = schedule_count_dict.get(classroom.id, 0)
-            usage_percentage = (schedule_count / total_schedules * 100) if total_schedules > 0 else 0
-            
-            classroom_details = {
-                "id": classroom.id,
-                "name": classroom.name,
-                "capacity": classroom.capacity,
-                "building": classroom.building,
-                "schedule_count": schedule_count,
-                "usage_percentage": round(usage_percentage, 2)
-            }
-            usage_stats["classroom_details"].append(classroom_details)
-        
-        # 按使用率排序
-        usage_stats["classroom_details"].sort(key=lambda x: x["schedule_count"], reverse=True)
-        
-        return usage_stats
+        return classroom_stats.usage_stats(db)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -201,49 +144,13 @@ def get_classroom_usage_stats(db: Session = Depends(get_db)):
         )
 
 @router.get("/stats/capacity", response_model=Dict[str, Any])
+@router.get("/stats/capacity/", response_model=Dict[str, Any], include_in_schema=False)
 def get_classroom_capacity_stats(db: Session = Depends(get_db)):
-    """获取教室容量统计"""
+    """获取教室容量统计（一条聚合查询，容量分组用 CASE 计数）"""
     try:
-        # 获取所有教室
-        classrooms = db.query(ClassroomModel).all()
-        
-        # 计算总容量
-        total_capacity = sum(classroom.capacity for classroom in classrooms)
-        
-        # 计算平均容量
-        average_capacity = total_capacity / len(classrooms) if classrooms else 0
-        
-        # 按容量分组统计
-        capacity_groups = {
-            "0-50": 0,
-            "51-100": 0,
-            "101-200": 0,
-            "201-500": 0,
-            "500+": 0
-        }
-        
-        for classroom in classrooms:
-            if classroom.capacity <= 50:
-                capacity_groups["0-50"] += 1
-            elif classroom.capacity <= 100:
-                capacity_groups["51-100"] += 1
-            elif classroom.capacity <= 200:
-                capacity_groups["101-200"] += 1
-            elif classroom.capacity <= 500:
-                capacity_groups["201-500"] += 1
-            else:
-                capacity_groups["500+"] += 1
-        
-        capacity_stats = {
-            "total_classrooms": len(classrooms),
-            "total_capacity": total_capacity,
-            "average_capacity": round(average_capacity, 2),
-            "capacity_groups": capacity_groups
-        }
-        
-        return capacity_stats
+        return classroom_stats.capacity_stats(db)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"获取教室容量统计失败: {str(e)}"
-        ) 
\ No newline at end of file
+        )
@@ -1,12 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List
-import csv
-import io
 from pydantic import BaseModel
 
-from app.config import get_db
+from app.config import SessionLocal, get_db
 from app.models.models import Course as CourseModel
+from app.models.schemas import ImportResponse, ListParams
+from app.services.csv_import import ImportFormatError, import_csv, import_message
+from app.services.pagination import list_page
+from app.services.export import export_response
+from app.services.problem import problem_cache
 
 router = APIRouter()
 
@@ -26,17 +30,12 @@ class Course(CourseBase):
         orm_mode = True
 
 @router.get("/", response_model=List[Course])
-def get_courses(db: Session = Depends(get_db)):
-    """获取所有课程列表"""
-    print("开始获取课程列表...")  # 添加调试日志
+def get_courses(params: ListParams = Depends(), db: Session = Depends(get_db)):
+    """获取课程列表，支持游标分页（limit、after）和字段选择（fields）"""
     try:
-        print("正在查询数据库...")  # 添加调试日志
-        courses = db.query(CourseModel).all()
-        print(f"查询到的课程: {courses}")  # 添加调试日志
-        if not courses:
-            print("没有找到任何课程")  # 添加调试日志
-            return []
-        return courses
+        return list_page(db, CourseModel, Course.__fields__, params)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"获取课程列表时出错: {str(e)}")  # 添加错误日志
         raise HTTPException(status_code=500, detail=str(e))
@@ -48,8 +47,17 @@ def create_course(course: CourseCreate, db: Session = Depends(get_db)):
     db.add(db_course)
     db.commit()
     db.refresh(db_course)
+    problem_cache.upsert("courses", db_course)
     return db_course
 
+@router.get("/export")
+def export_courses(fmt: str = Query("csv", alias="format", regex="^(csv|xlsx)$")):
+    """流式导出课程数据（CSV 或 XLSX），列名与导入格式一致"""
+    statement = select(
+        CourseModel.id, CourseModel.name, CourseModel.code, CourseModel.credits, CourseModel.hours
+    ).order_by(CourseModel.id)
+    return export_response(SessionLocal, statement, ["id", "name", "code", "credits", "hours"], "courses", fmt)
+
 @router.get("/{course_id}", response_model=Course)
 def get_course(course_id: int, db: Session = Depends(get_db)):
     """获取指定课程信息"""
@@ -70,6 +78,7 @@ def update_course(course_id: int, course: CourseCreate, db: Session = Depends(ge
     
     db.commit()
     db.refresh(db_course)
+    problem_cache.upsert("courses", db_course)
     return db_course
 
 @router.delete("/{course_id}")
@@ -81,32 +90,35 @@ def delete_course(course_id: int, db: Session = Depends(get_db)):
     
     db.delete(course)
     db.commit()
+    problem_cache.remove("courses", course_id)
     return {"message": "课程已删除"}
 
-@router.post("/import")
-async def import_courses(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    """从CSV文件导入课程数据"""
+def _parse_course(row: dict) -> dict:
+    """校验并转换一行课程数据"""
+    name, code = (row['name'] or '').strip(), (row['code'] or '').strip()
+    if not name or len(name) > 100:
+        raise ValueError(f"课程名称无效: {name}")
+    if not code or len(code) > 20:
+        raise ValueError(f"课程代码无效: {code}")
+    try:
+        credits, hours = float(row['credits']), int(row['hours'])
+    except (TypeError, ValueError):
+        raise ValueError(f"学分或学时不是数字: {row['credits']}, {row['hours']}")
+    if credits < 0 or hours <= 0:
+        raise ValueError(f"学分不能为负、学时必须大于0: {credits}, {hours}")
+    return {"name": name, "code": code, "credits": credits, "hours": hours}
+
+@router.post("/import", response_model=ImportResponse)
+def import_courses(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    """从CSV文件导入课程数据，按课程代码更新已有课程，逐行报告无效数据"""
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="只支持CSV文件")
     
-    content = await file.read()
-    csv_data = content.decode('utf-8-sig')
-    csv_reader = csv.DictReader(io.StringIO(csv_data))
-    
-    courses = []
-    for row in csv_reader:
-        course = CourseModel(
-            name=row['name'],
-            code=row['code'],
-            credits=float(row['credits']),
-            hours=int(row['hours'])
-        )
-        courses.append(course)
-    
     try:
-        db.add_all(courses)
-        db.commit()
-        return {"message": f"成功导入 {len(courses)} 条课程数据"}
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        result = import_csv(db, file.file, CourseModel, _parse_course,
+                            required=["name", "code", "credits", "hours"], key="code")
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        problem_cache.invalidate()
+    return {"message": import_message(result, "课程"), **result} 
\ No newline at end of file
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.startup import startup_state
+
+router = APIRouter()
+
+@router.get("/health")
+def health():
+    """就绪检查：启动预热（数据库版本、连接池、缓存）完成前返回 503，附带每一步的耗时或错误"""
+    state = startup_state.to_dict()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+@router.get("/health/live")
+def liveness():
+    """存活检查：进程能处理请求即返回 200，不访问数据库"""
+    return {"status": "alive"}
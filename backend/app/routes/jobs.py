@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict, Any
+
+from app.config import SessionLocal
+from app.models.schemas import ScheduleGenerateParams
+from app.scheduler import run_generation
+from app.services.jobs import Job, job_manager, SUCCEEDED, FAILED, CANCELLED
+from app.services.response_cache import response_cache
+
+router = APIRouter()
+
+def _generate(job: Job, params: ScheduleGenerateParams) -> Dict[str, Any]:
+    """在工作线程中执行排课，使用独立的数据库会话"""
+    db = SessionLocal()
+    try:
+        return run_generation(db, params, progress=job.set_progress)
+    finally:
+        db.close()
+        # 任务可能已经替换了课表，缓存的课表响应失效
+        response_cache.bump("schedules")
+
+def _get_job(job_id: str) -> Job:
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
+
+@router.post("/", status_code=202)
+def submit_generate_job(params: ScheduleGenerateParams = Depends()):
+    """提交自动排课任务，立即返回任务ID"""
+    job = job_manager.submit(_generate, params)
+    return job.to_dict()
+
+@router.get("/{job_id}")
+def get_job(job_id: str):
+    """查询任务状态和进度"""
+    return _get_job(job_id).to_dict()
+
+@router.get("/{job_id}/result")
+def get_job_result(job_id: str):
+    """获取任务结果"""
+    job = _get_job(job_id)
+    if job.status == SUCCEEDED:
+        return job.result
+    if job.status == FAILED:
+        raise HTTPException(status_code=500, detail=f"排课任务失败: {job.error}")
+    if job.status == CANCELLED:
+        raise HTTPException(status_code=409, detail="排课任务已取消")
+    raise HTTPException(status_code=409, detail="排课任务尚未完成")
+
+@router.delete("/{job_id}")
+def cancel_job(job_id: str):
+    """取消任务"""
+    job = job_manager.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job.to_dict()
@@ -0,0 +1,168 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional
+
+from app.config import SessionLocal, get_db
+from app.models.models import Schedule, Course, Teacher, Classroom
+from app.models.schemas import BatchMoveRequest, ConflictCheckRequest
+from app.services.batch_moves import BatchError, apply_batch
+from app.services.change_feed import change_feed
+from app.services.export import export_response
+from app.services.live_occupancy import live_occupancy
+from app.services.problem import problem_cache
+from app.services.timetable import BUILDING, CLASSROOM, TEACHER, timetable_cache
+
+router = APIRouter()
+
+@router.get("/export")
+def export_schedule(fmt: str = Query("csv", alias="format", regex="^(csv|xlsx)$")):
+    """流式导出整张课表（CSV 或 XLSX），按 周几、节次、教室 排序"""
+    statement = (
+        select(
+            Schedule.id,
+            Schedule.day,
+            Schedule.period,
+            Schedule.course_id,
+            Course.code,
+            Course.name,
+            Schedule.teacher_id,
+            Teacher.name,
+            Schedule.classroom_id,
+            Classroom.name,
+            Classroom.building,
+        )
+        .join(Course, Schedule.course_id == Course.id)
+        .join(Teacher, Schedule.teacher_id == Teacher.id)
+        .join(Classroom, Schedule.classroom_id == Classroom.id)
+        .order_by(Schedule.day, Schedule.period, Schedule.classroom_id)
+    )
+    header = [
+        "id", "day", "period", "course_id", "course_code", "course_name",
+        "teacher_id", "teacher_name", "classroom_id", "classroom_name", "building",
+    ]
+    return export_response(SessionLocal, statement, header, "schedule", fmt)
+
+def _select(records, ids: Optional[List[int]], noun: str):
+    """按ID选取记录，保持请求中的顺序；有不存在的ID时返回 404"""
+    if ids is None:
+        return list(records)
+    by_id = {record.id: record for record in records}
+    missing = [i for i in ids if i not in by_id]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"{noun}不存在: {missing}")
+    return [by_id[i] for i in dict.fromkeys(ids)]
+
+def _timetables(db: Session, kind: str, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    data = timetable_cache.grids(db, kind, [item["key"] for item in items])
+    return {
+        "days": data["days"],
+        "periods": data["periods"],
+        "timetables": [
+            {**{k: v for k, v in item.items() if k != "key"}, "grid": data["grids"][item["key"]]}
+            for item in items
+        ],
+    }
+
+@router.get("/timetable/teachers", response_model=Dict[str, Any])
+def get_teacher_timetables(ids: Optional[List[int]] = Query(None), department: Optional[str] = None,
+                           db: Session = Depends(get_db)):
+    """
+    一次获取多位教师的周课表网格 grid[周几 - 1][节次 - 1]，每格为一条排课或 null
+    ids 可重复指定多个教师，department 按院系筛选，都不指定时返回全部教师
+    """
+    teachers = _select(problem_cache.get(db).teachers, ids, "教师")
+    if department is not None:
+        teachers = [t for t in teachers if t.department == department]
+    return _timetables(db, TEACHER, [
+        {"key": t.id, "id": t.id, "name": t.name, "department": t.department} for t in teachers
+    ])
+
+@router.get("/timetable/classrooms", response_model=Dict[str, Any])
+def get_classroom_timetables(ids: Optional[List[int]] = Query(None), building: Optional[str] = None,
+                             db: Session = Depends(get_db)):
+    """
+    一次获取多个教室的周课表网格，每格为一条排课或 null
+    ids 可重复指定多个教室，building 按教学楼筛选，都不指定时返回全部教室
+    """
+    classrooms = _select(problem_cache.get(db).classrooms, ids, "教室")
+    if building is not None:
+        classrooms = [c for c in classrooms if c.building == building]
+    return _timetables(db, CLASSROOM, [
+        {"key": c.id, "id": c.id, "name": c.name, "building": c.building, "capacity": c.capacity}
+        for c in classrooms
+    ])
+
+@router.get("/timetable/buildings", response_model=Dict[str, Any])
+def get_building_timetables(names: Optional[List[str]] = Query(None), db: Session = Depends(get_db)):
+    """一次获取多个教学楼的周课表网格，每格为该时间段楼内所有排课的列表；不指定 names 时返回全部教学楼"""
+    buildings = problem_cache.get(db).room_index.buildings
+    if names is None:
+        names = sorted(buildings)
+    missing = [name for name in names if name not in buildings]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"教学楼不存在: {missing}")
+    return _timetables(db, BUILDING, [{"key": name, "name": name} for name in dict.fromkeys(names)])
+
+@router.post("/check", response_model=Dict[str, Any])
+def check_candidates(request: ConflictCheckRequest, db: Session = Depends(get_db)):
+    """
+    批量检查候选位置是否与已提交的课表冲突（内存中的实时占用索引，不查询数据库），
+    results 与 candidates 一一对应
+    """
+    results = live_occupancy.check(db, [candidate.dict() for candidate in request.candidates])
+    return {"results": [{"ok": not conflicts, "conflicts": conflicts} for conflicts in results]}
+
+@router.post("/batch", response_model=Dict[str, Any])
+def batch_update(request: BatchMoveRequest, db: Session = Depends(get_db)):
+    """
+    批量移动、交换排课：按顺序执行全部操作后一次性检查最终状态，
+    没有冲突时在一个事务中写入，否则不做任何修改并返回完整的冲突列表
+    """
+    try:
+        return apply_batch(db, [operation.dict() for operation in request.operations])
+    except BatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/drop-targets", response_model=Dict[str, Any])
+def get_drop_targets(schedule_id: Optional[int] = None, teacher_id: Optional[int] = None,
+                     classroom_id: Optional[int] = None, length: int = Query(1, ge=1, le=8),
+                     db: Session = Depends(get_db)):
+    """
+    拖动排课时所有可以放下的 (day, period)：教师和教室同时空闲
+    指定 schedule_id 时教师、教室默认取该排课的，它当前的位置视为空闲；
+    指定 classroom_id / teacher_id 可以查询换到其他教室、教师后的可放位置
+    """
+    if schedule_id is not None:
+        row = live_occupancy.row(db, schedule_id)
+        if row is None:
+            raise HTTPException(status_code=404, detail="排课不存在")
+        teacher_id = row.teacher_id if teacher_id is None else teacher_id
+        classroom_id = row.classroom_id if classroom_id is None else classroom_id
+    if teacher_id is None or classroom_id is None:
+        raise HTTPException(status_code=400, detail="需要指定 schedule_id，或同时指定 teacher_id 和 classroom_id")
+    targets = live_occupancy.drop_targets(db, teacher_id, classroom_id, schedule_id, length)
+    return {
+        "schedule_id": schedule_id,
+        "teacher_id": teacher_id,
+        "classroom_id": classroom_id,
+        "targets": [{"day": day, "period": period} for day, period in targets],
+    }
+
+@router.get("/changes")
+async def stream_changes(request: Request, since: Optional[int] = None,
+                         last_event_id: Optional[str] = Header(None)):
+    """
+    课表变更推送（Server-Sent Events），每条消息是一个事务的改动，带递增的序号 seq
+    since 为客户端最后收到的序号，只补发之后的消息；浏览器 EventSource 重连时会自动带上 Last-Event-ID，
+    它比 URL 中的 since 更新（重连时 URL 不变），两者都有时以 Last-Event-ID 为准
+    都不指定时从当前开始推送，连接后的第一条 hello 消息给出当前序号
+    """
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    return StreamingResponse(
+        change_feed.stream(since, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
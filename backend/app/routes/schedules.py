@@ -1,70 +1,116 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+from app.config import get_async_db
+from app.models.models import Schedule as ScheduleModel, Course, Teacher, Classroom
+from app.services import classroom_stats, schedule_changes
+from app.services.availability import slot_conflicts_statement
+from app.services.occupancy import DAYS_PER_WEEK, PERIODS_PER_DAY
 
 router = APIRouter()
 
 class Schedule(BaseModel):
-    id: int = None
+    id: Optional[int] = None
     course_id: int
     teacher_id: int
     classroom_id: int
     day: int  # 1-7 表示周一到周日
     period: int  # 1-12 表示第1-12节课
 
-# 模拟数据库
-schedules_db = []
+    class Config:
+        orm_mode = True
+
+class ScheduleCreate(BaseModel):
+    """新增、修改排课的请求，时间必须在周课表网格内"""
+    course_id: int
+    teacher_id: int
+    classroom_id: int
+    day: int = Field(..., ge=1, le=DAYS_PER_WEEK, description="星期几")
+    period: int = Field(..., ge=1, le=PERIODS_PER_DAY, description="第几节课")
+
+async def _check_refs(db: AsyncSession, schedule: ScheduleCreate):
+    """检查排课引用的课程、教师、教室是否存在"""
+    for model, key, noun in ((Course, schedule.course_id, "课程"), (Teacher, schedule.teacher_id, "教师"),
+                             (Classroom, schedule.classroom_id, "教室")):
+        if await db.get(model, key) is None:
+            raise HTTPException(status_code=400, detail=f"{noun}不存在: {key}")
+
+async def _check_slot(db: AsyncSession, schedule: ScheduleCreate, exclude_schedule_id: Optional[int] = None):
+    """
+    检查时间冲突：按 (day, period, 教室) 和 (day, period, 教师) 的唯一索引各查一条，
+    与课表大小无关
+    """
+    statement = slot_conflicts_statement(schedule.day, schedule.period, schedule.classroom_id,
+                                         schedule.teacher_id, exclude_schedule_id)
+    for s in (await db.execute(statement)).scalars():
+        if s.classroom_id == schedule.classroom_id:
+            raise HTTPException(status_code=400, detail="该时间段该教室已被占用")
+        raise HTTPException(status_code=400, detail="该时间段该教师已有其他课程")
+
+async def _commit(db: AsyncSession):
+    """提交修改；并发请求抢先占用了同一时间段时，唯一约束会拒绝这次写入"""
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="该时间段该教室或教师已被占用")
 
 @router.get("/", response_model=List[Schedule])
-async def get_schedules():
-    return schedules_db
+async def get_schedules(db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(ScheduleModel).order_by(ScheduleModel.id))
+    return result.scalars().all()
 
 @router.post("/", response_model=Schedule)
-async def create_schedule(schedule: Schedule):
-    # 检查时间冲突
-    for s in schedules_db:
-        if (s.day == schedule.day and 
-            s.period == schedule.period and 
-            s.classroom_id == schedule.classroom_id):
-            raise HTTPException(
-                status_code=400,
-                detail="该时间段该教室已被占用"
-            )
-    
-    schedule.id = len(schedules_db) + 1
-    schedules_db.append(schedule)
-    return schedule
+async def create_schedule(schedule: ScheduleCreate, db: AsyncSession = Depends(get_async_db)):
+    # 检查引用和时间冲突
+    await _check_refs(db, schedule)
+    await _check_slot(db, schedule)
+
+    db_schedule = ScheduleModel(**schedule.dict())
+    db.add(db_schedule)
+    await db.run_sync(classroom_stats.apply_deltas, {schedule.classroom_id: 1})
+    schedule_changes.record(db, upserted=[db_schedule])
+    await _commit(db)
+    return db_schedule
 
 @router.get("/{schedule_id}", response_model=Schedule)
-async def get_schedule(schedule_id: int):
-    for schedule in schedules_db:
-        if schedule.id == schedule_id:
-            return schedule
-    raise HTTPException(status_code=404, detail="Schedule not found")
+async def get_schedule(schedule_id: int, db: AsyncSession = Depends(get_async_db)):
+    schedule = await db.get(ScheduleModel, schedule_id)
+    if not schedule:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    return schedule
 
 @router.put("/{schedule_id}", response_model=Schedule)
-async def update_schedule(schedule_id: int, schedule: Schedule):
-    # 检查时间冲突
-    for s in schedules_db:
-        if (s.id != schedule_id and
-            s.day == schedule.day and 
-            s.period == schedule.period and 
-            s.classroom_id == schedule.classroom_id):
-            raise HTTPException(
-                status_code=400,
-                detail="该时间段该教室已被占用"
-            )
-    
-    for i, s in enumerate(schedules_db):
-        if s.id == schedule_id:
-            schedule.id = schedule_id
-            schedules_db[i] = schedule
-            return schedule
-    raise HTTPException(status_code=404, detail="Schedule not found")
-
-@router.delete("/{schedule_id}")
-async def delete_schedule(schedule_id: int):
-    for i, schedule in enumerate(schedules_db):
-        if schedule.id == schedule_id:
-            return schedules_db.pop(i)
-    raise HTTPException(status_code=404, detail="Schedule not found") 
\ No newline at end of file
+async def update_schedule(schedule_id: int, schedule: ScheduleCreate, db: AsyncSession = Depends(get_async_db)):
+    db_schedule = await db.get(ScheduleModel, schedule_id)
+    if not db_schedule:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+
+    # 检查引用和时间冲突
+    await _check_refs(db, schedule)
+    await _check_slot(db, schedule, exclude_schedule_id=schedule_id)
+
+    if db_schedule.classroom_id != schedule.classroom_id:
+        await db.run_sync(classroom_stats.apply_deltas,
+                          {db_schedule.classroom_id: -1, schedule.classroom_id: 1})
+    for key, value in schedule.dict().items():
+        setattr(db_schedule, key, value)
+    schedule_changes.record(db, upserted=[db_schedule])
+    await _commit(db)
+    return db_schedule
+
+@router.delete("/{schedule_id}", response_model=Schedule)
+async def delete_schedule(schedule_id: int, db: AsyncSession = Depends(get_async_db)):
+    schedule = await db.get(ScheduleModel, schedule_id)
+    if not schedule:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    deleted = Schedule.from_orm(schedule)
+    await db.delete(schedule)
+    await db.run_sync(classroom_stats.apply_deltas, {schedule.classroom_id: -1})
+    schedule_changes.record(db, deleted=[schedule_id])
+    await db.commit()
+    return deleted
@@ -1,12 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List
-import csv
-import io
 from pydantic import BaseModel
 
-from app.config import get_db
+from app.config import SessionLocal, get_db
 from app.models.models import Teacher as TeacherModel
+from app.models.schemas import ImportResponse, ListParams
+from app.services.csv_import import ImportFormatError, import_csv, import_message
+from app.services.pagination import list_page
+from app.services.export import export_response
+from app.services.problem import problem_cache
+from app.services.repair import repair_schedule
 
 router = APIRouter()
 
@@ -25,9 +30,9 @@ class Teacher(TeacherBase):
         orm_mode = True
 
 @router.get("/", response_model=List[Teacher])
-def get_teachers(db: Session = Depends(get_db)):
-    """获取所有教师列表"""
-    return db.query(TeacherModel).all()
+def get_teachers(params: ListParams = Depends(), db: Session = Depends(get_db)):
+    """获取教师列表，支持游标分页（limit、after）和字段选择（fields）"""
+    return list_page(db, TeacherModel, Teacher.__fields__, params)
 
 @router.post("/", response_model=Teacher)
 def create_teacher(teacher: TeacherCreate, db: Session = Depends(get_db)):
@@ -36,8 +41,17 @@ def create_teacher(teacher: TeacherCreate, db: Session = Depends(get_db)):
     db.add(db_teacher)
     db.commit()
     db.refresh(db_teacher)
+    problem_cache.upsert("teachers", db_teacher)
     return db_teacher
 
+@router.get("/export")
+def export_teachers(fmt: str = Query("csv", alias="format", regex="^(csv|xlsx)$")):
+    """流式导出教师数据（CSV 或 XLSX），列名与导入格式一致"""
+    statement = select(
+        TeacherModel.id, TeacherModel.name, TeacherModel.title, TeacherModel.department
+    ).order_by(TeacherModel.id)
+    return export_response(SessionLocal, statement, ["id", "name", "title", "department"], "teachers", fmt)
+
 @router.get("/{teacher_id}", response_model=Teacher)
 def get_teacher(teacher_id: int, db: Session = Depends(get_db)):
     """获取指定教师信息"""
@@ -58,6 +72,7 @@ def update_teacher(teacher_id: int, teacher: TeacherCreate, db: Session = Depend
     
     db.commit()
     db.refresh(db_teacher)
+    problem_cache.upsert("teachers", db_teacher)
     return db_teacher
 
 @router.delete("/{teacher_id}")
@@ -67,33 +82,33 @@ def delete_teacher(teacher_id: int, db: Session = Depends(get_db)):
     if not teacher:
         raise HTTPException(status_code=404, detail="教师不存在")
     
+    # 先把该教师的课程交给其他教师，其余课表保持不变
+    repair = repair_schedule(db, teacher_id=teacher_id, commit=False)
     db.delete(teacher)
     db.commit()
-    return {"message": "教师已删除"}
+    problem_cache.remove("teachers", teacher_id)
+    return {"message": "教师已删除", "repair": repair}
+
+def _parse_teacher(row: dict) -> dict:
+    """校验并转换一行教师数据"""
+    name = (row['name'] or '').strip()
+    if not name or len(name) > 50:
+        raise ValueError(f"教师姓名无效: {name}")
+    title, department = (row.get('title') or '').strip(), (row.get('department') or '').strip()
+    if len(title) > 50 or len(department) > 50:
+        raise ValueError(f"职称或院系过长: {title}, {department}")
+    return {"name": name, "title": title, "department": department}
 
-@router.post("/import")
-async def import_teachers(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    """从CSV文件导入教师数据"""
+@router.post("/import", response_model=ImportResponse)
+def import_teachers(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    """从CSV文件导入教师数据（教师没有唯一键，全部作为新教师插入），逐行报告无效数据"""
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="只支持CSV文件")
     
-    content = await file.read()
-    csv_data = content.decode('utf-8-sig')
-    csv_reader = csv.DictReader(io.StringIO(csv_data))
-    
-    teachers = []
-    for row in csv_reader:
-        teacher = TeacherModel(
-            name=row['name'],
-            title=row.get('title', ''),
-            department=row.get('department', '')
-        )
-        teachers.append(teacher)
-    
     try:
-        db.add_all(teachers)
-        db.commit()
-        return {"message": f"成功导入 {len(teachers)} 条教师数据"}
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        result = import_csv(db, file.file, TeacherModel, _parse_teacher, required=["name"])
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        problem_cache.invalidate()
+    return {"message": import_message(result, "教师"), **result} 
\ No newline at end of file
@@ -1,145 +1,354 @@
-from typing import List, Dict, Set
+from typing import Callable, List, Dict, Optional, Tuple
 from datetime import datetime
-from .models import Course, Teacher, Classroom, Schedule
+import random
+from .models.schemas import ScheduleGenerateParams
+from .services.conflicts import find_conflict_groups, schedule_columns
+from .services.csp import CSPSolver
+from .services.multistart import make_seeds, multi_start
+from .services.local_search import LocalSearch
+from .services.persistence import replace_schedule
+from .services.occupancy import OccupancyIndex, days_mask, block_mask, lowest_slot, slot_to_day_period
+from .services.rooms import MIN_CLASSROOM_CAPACITY
+from .services.problem import ProblemSnapshot, CourseData, TeacherData, ClassroomData, problem_cache
+from .services.sessions import course_sessions
 from sqlalchemy.orm import Session
 
+def run_seeded_generation(seed: int, snapshot: ProblemSnapshot, engine: str,
+                          time_limit: float, optimize_time: float = 0) -> Dict:
+    """使用指定种子执行一次排课（模块级函数，供多进程调用）"""
+    scheduler = Scheduler(None, seed=seed)
+    schedule = scheduler.plan(snapshot, engine=engine, time_limit=time_limit,
+                              optimize_time=optimize_time)
+    return {
+        'seed': seed,
+        'score': scheduler.score(schedule),
+        'schedule': schedule,
+        'conflicts': scheduler.conflicts,
+        'optimization': scheduler.optimization
+    }
+
+def run_generation(db: Session, params: ScheduleGenerateParams,
+                   progress: Optional[Callable[[float], None]] = None) -> Dict:
+    """
+    执行一次自动排课并返回接口响应
+    conflicts 为课表内的冲突；unplaced 为没能安排的课次（以及排课失败的原因），
+    unplaced_periods 为因此少排的节数，不为 0 时课程学时没有全部满足
+    """
+    scheduler = Scheduler(db, seed=params.seed, progress=progress)
+    schedule = scheduler.generate_schedule(
+        engine=params.engine, time_limit=params.time_limit, runs=params.runs,
+        workers=params.workers, optimize_time=params.optimize_time
+    )
+    conflicts = scheduler.check_conflicts(schedule)
+    return {
+        "success": True,
+        "schedule": schedule,
+        "conflicts": conflicts,
+        "unplaced": scheduler.conflicts,
+        "unplaced_periods": sum(item.get('periods', 0) for item in scheduler.conflicts),
+        "seed": scheduler.seed,
+        "runs": scheduler.runs,
+        "optimization": scheduler.optimization
+    }
+
 class Scheduler:
-    def __init__(self, db: Session):
+    def __init__(self, db: Optional[Session], seed: Optional[int] = None,
+                 progress: Optional[Callable[[float], None]] = None):
         self.db = db
         self.conflicts = []
+        # 进度回调，参数为 0~1 之间的整体进度
+        self.progress = progress
+        # 记录随机种子，便于复现排课结果
+        self.seed = seed if seed is not None else make_seeds(1)[0]
+        self.random = random.Random(self.seed)
+        self.runs = []
+        self.optimization = None
         
-    def generate_schedule(self) -> List[Dict]:
-        """生成课表"""
+    def generate_schedule(self, engine: str = 'greedy', time_limit: float = 5.0,
+                          runs: int = 1, workers: Optional[int] = None,
+                          optimize_time: float = 0) -> List[Dict]:
+        """
+        生成课表
+        engine: 'greedy' 为逐门课程贪心安排，'csp' 为约束传播回溯求解（受 time_limit 秒数限制）
+        runs: 大于1时在进程池中用不同种子并行排课，保留得分最高的结果
+        optimize_time: 大于0时在排课后用局部搜索继续优化指定秒数
+        """
         try:
-            # 获取所有需要排课的课程
-            courses = self.db.query(Course).all()
-            # 获取所有可用教室
-            classrooms = self.db.query(Classroom).all()
-            # 获取所有教师
-            teachers = self.db.query(Teacher).all()
-            
-            if not courses or not classrooms or not teachers:
-                self.conflicts.append({
-                    'message': '没有足够的课程、教室或教师数据'
-                })
-                return []
-            
-            # 按课程优先级排序（这里简单按照课程ID排序）
-            courses.sort(key=lambda x: x.id)
+            snapshot = problem_cache.get(self.db)
             
-            # 初始化课表
-            schedule = []
-            used_slots = set()  # 记录已使用的时间槽
-            
-            # 为每个课程分配时间槽和教室
-            for course in courses:
-                # 随机选择一个教师
-                import random
-                teacher = random.choice(teachers)
-                
-                # 找到合适的教室（容量足够且未被使用）
-                suitable_classrooms = [
-                    c for c in classrooms 
-                    if c.capacity >= 50  # 临时使用固定容量
-                ]
-                
-                if not suitable_classrooms:
-                    self.conflicts.append({
-                        'course_id': course.id,
-                        'message': f'课程 {course.name} 没有合适的教室'
-                    })
-                    continue
-                
-                # 随机选择一个合适的教室
-                classroom = random.choice(suitable_classrooms)
-                
-                # 找到可用的时间槽
-                time_slot = self._find_available_slot(course, teacher, classroom, used_slots)
-                if not time_slot:
-                    self.conflicts.append({
-                        'course_id': course.id,
-                        'message': f'课程 {course.name} 无法找到合适的时间槽'
-                    })
-                    continue
-                
-                # 创建排课记录
-                schedule_item = {
-                    'course_id': course.id,
-                    'course_name': course.name,
-                    'teacher_id': teacher.id,
-                    'teacher_name': teacher.name,
-                    'classroom_id': classroom.id,
-                    'classroom_name': classroom.name,
-                    'day': time_slot['day'],
-                    'period': time_slot['period'],
-                    'has_conflict': False
-                }
-                
-                # 保存到数据库
-                new_schedule = Schedule(
-                    course_id=course.id,
-                    teacher_id=teacher.id,
-                    classroom_id=classroom.id,
-                    day=time_slot['day'],
-                    period=time_slot['period']
+            if runs > 1:
+                seeds = make_seeds(runs, self.seed)
+                best, self.runs = multi_start(
+                    run_seeded_generation, seeds, (snapshot, engine, time_limit, optimize_time), workers,
+                    progress=self._progress_range(0, 0.9)
                 )
-                self.db.add(new_schedule)
-                
-                schedule.append(schedule_item)
-                used_slots.add((time_slot['day'], time_slot['period'], classroom.id))
+                self.seed = best['seed']
+                self.conflicts.extend(best['conflicts'])
+                self.optimization = best['optimization']
+                schedule = best['schedule']
+            else:
+                schedule = self.plan(snapshot, engine=engine, time_limit=time_limit,
+                                     optimize_time=optimize_time)
+                self.runs = [{'seed': self.seed, 'score': self.score(schedule)}]
             
-            # 提交数据库事务
-            self.db.commit()
+            # 在一个事务中用新课表替换旧课表；没有排出任何课程时保留原课表
+            if schedule:
+                replace_schedule(self.db, schedule)
             
             return schedule
             
-        except Exception as e:
-            # 发生错误时回滚事务
+        except Exception:
+            # 发生错误（包括任务被取消）时回滚事务，错误交给调用方处理，后台任务据此标记为失败
             self.db.rollback()
+            raise
+    
+    def plan(self, snapshot: ProblemSnapshot, engine: str = 'greedy',
+             time_limit: float = 5.0, optimize_time: float = 0) -> List[Dict]:
+        """
+        根据问题快照计算课表，不访问数据库
+        每门课程按学时展开为每周若干次课（两节或三节连排），同一门课由同一位教师承担，
+        课表中每节课对应一条记录
+        """
+        courses = list(snapshot.courses)
+        classrooms = list(snapshot.classrooms)
+        teachers = list(snapshot.teachers)
+        
+        if not courses or not classrooms or not teachers:
             self.conflicts.append({
-                'message': f'自动排课失败: {str(e)}'
+                'message': '没有足够的课程、教室或教师数据'
             })
             return []
         
-    def _find_available_slot(self, course: Course, teacher: Teacher, 
-                           classroom: Classroom, used_slots: Set) -> Dict:
-        """查找可用的时间槽"""
-        # 简单实现：遍历所有可能的时间槽
-        for day in range(1, 6):  # 周一到周五
-            for period in range(1, 9):  # 8节课
-                slot = (day, period, classroom.id)
-                if slot not in used_slots:
-                    return {'day': day, 'period': period}
-        return None
+        # 按课程优先级排序（这里简单按照课程ID排序）
+        courses.sort(key=lambda x: x.id)
+        
+        # 找到合适的教室（容量足够），按容量从小到大排列
+        suitable_classrooms = snapshot.room_index.fitting(MIN_CLASSROOM_CAPACITY)
+        
+        if not suitable_classrooms:
+            for course in courses:
+                self.conflicts.append({
+                    'course_id': course.id,
+                    'periods': sum(course_sessions(course.hours)),
+                    'message': f'课程 {course.name} 没有合适的教室'
+                })
+            return []
+        
+        # 排课和优化阶段占整体进度的前 90%，剩余部分留给保存结果
+        split = 0.6 if optimize_time > 0 else 0.9
+        if engine == 'csp':
+            placements, unplaced = self._place_csp(
+                courses, teachers, suitable_classrooms, time_limit, self._progress_range(0, split)
+            )
+        else:
+            placements, unplaced = self._place_greedy(
+                courses, teachers, suitable_classrooms, self._progress_range(0, split)
+            )
+        
+        if optimize_time > 0:
+            placements, unplaced = self._optimize(
+                placements, unplaced, suitable_classrooms, optimize_time, self._progress_range(split, 0.9)
+            )
+        
+        for course, _, length in unplaced:
+            self.conflicts.append({
+                'course_id': course.id,
+                'periods': length,
+                'message': f'课程 {course.name} 的{length}节连排课无法找到合适的时间槽'
+            })
+        
+        # 创建排课记录，连排的每一节各占一条
+        return [
+            {
+                'course_id': course.id,
+                'course_name': course.name,
+                'teacher_id': teacher.id,
+                'teacher_name': teacher.name,
+                'classroom_id': classroom.id,
+                'classroom_name': classroom.name,
+                'day': time_slot['day'],
+                'period': time_slot['period'] + k,
+                'has_conflict': False
+            }
+            for course, teacher, classroom, time_slot in placements
+            for k in range(time_slot['length'])
+        ]
+    
+    def score(self, schedule: List[Dict]) -> int:
+        """课表得分：成功安排的课程数，存在冲突的记录会被扣分"""
+        return len(schedule) - 2 * len(self.check_conflicts(schedule))
+    
+    def _progress_range(self, start: float, end: float) -> Optional[Callable[[float], None]]:
+        """把某个阶段 0~1 的进度映射到整体进度的 [start, end] 区间"""
+        if self.progress is None:
+            return None
+        return lambda fraction: self.progress(start + (end - start) * min(fraction, 1.0))
+    
+    def _place_greedy(self, courses: List[CourseData], teachers: List[TeacherData],
+                      classrooms: List[ClassroomData],
+                      progress: Optional[Callable[[float], None]] = None) -> Tuple[List[Tuple], List[Tuple]]:
+        """
+        逐门课程随机选择教师和教室，再为每次课安排第一段连续空闲的时间槽；
+        随机选中的教室没有空位时依次尝试其他合适的教室，每次课最多尝试一遍所有教室
+        """
+        placements = []
+        unplaced = []
+        occupancy = OccupancyIndex()  # 记录教室和教师已占用的时间槽
+        
+        # 为每个课程分配时间槽和教室
+        for i, course in enumerate(courses):
+            if progress is not None and i % 64 == 0:
+                progress(i / len(courses))
+            # 随机选择一个教师
+            teacher = self.random.choice(teachers)
+            # 随机选择一个合适的教室，其他教室作为备选
+            classroom = self.random.choice(classrooms)
+            rooms = [classroom] + [c for c in classrooms if c.id != classroom.id]
+            
+            course_mask = 0  # 本课程已安排的时间槽，用于把各次课分散到不同的天
+            for length in course_sessions(course.hours):
+                found = self._find_available_block(teacher, rooms, length, course_mask, occupancy)
+                if found is None:
+                    unplaced.append((course, teacher, length))
+                    continue
+                room, time_slot = found
+                placements.append((course, teacher, room, time_slot))
+                occupancy.occupy(teacher.id, room.id, time_slot['slot'], length)
+                course_mask |= block_mask(time_slot['slot'], length)
+        
+        return placements, unplaced
+    
+    def _place_csp(self, courses: List[CourseData], teachers: List[TeacherData],
+                   classrooms: List[ClassroomData], time_limit: float,
+                   progress: Optional[Callable[[float], None]] = None) -> Tuple[List[Tuple], List[Tuple]]:
+        """为每门课程随机指定教师后，把每次课作为一个变量，用约束求解器同时安排时间槽和教室"""
+        course_teachers = [self.random.choice(teachers) for _ in courses]
+        sessions = [
+            (course, teacher, length)
+            for course, teacher in zip(courses, course_teachers)
+            for length in course_sessions(course.hours)
+        ]
+        # classrooms 已按容量从小到大排列：优先使用容量小的教室，把大教室留给其他课程
+        classroom_by_id = {c.id: c for c in classrooms}
+        room_ids = [c.id for c in classrooms]
+        
+        solver = CSPSolver(
+            [(teacher.id, room_ids) for _, teacher, _ in sessions],
+            time_limit=time_limit,
+            progress=progress,
+            lengths=[length for _, _, length in sessions]
+        )
+        result = solver.solve()
+        
+        placements = []
+        unplaced = []
+        for i, (course, teacher, length) in enumerate(sessions):
+            if i not in result['assignment']:
+                unplaced.append((course, teacher, length))
+                continue
+            slot, classroom_id = result['assignment'][i]
+            placements.append((course, teacher, classroom_by_id[classroom_id], self._time_slot(slot, length)))
+        return placements, unplaced
+    
+    def _optimize(self, placements: List[Tuple], unplaced: List[Tuple],
+                  classrooms: List[ClassroomData], time_limit: float,
+                  progress: Optional[Callable[[float], None]] = None) -> Tuple[List[Tuple], List[Tuple]]:
+        """
+        用局部搜索改进课表：未能安排的课程先随机放入，与已安排的课程一起优化，
+        结束后仍存在冲突的排课退回为未安排
+        """
+        classroom_by_id = {c.id: c for c in classrooms}
+        room_ids = [c.id for c in classrooms]
+        items = [
+            (course, teacher, time_slot['length']) for course, teacher, _, time_slot in placements
+        ] + list(unplaced)
+        entries = [
+            (teacher.id, classroom.id, time_slot['slot'])
+            for _, teacher, classroom, time_slot in placements
+        ] + [
+            (teacher.id, self.random.choice(room_ids), 0)
+            for _, teacher, _ in unplaced
+        ]
+        
+        search = LocalSearch(entries, [room_ids] * len(entries), rng=self.random,
+                             lengths=[length for _, _, length in items])
+        # 未能安排的课程先随机放入
+        for i in range(len(placements), len(entries)):
+            search.move(i, search.room[i], search.random_start(i))
+        self.optimization = search.optimize(time_limit=time_limit, progress=progress)
+        
+        # 从后往前去掉仍有冲突的排课，优先保留原先已安排的课程
+        for i in reversed(range(len(entries))):
+            if search.has_conflict(i):
+                search.drop(i)
+        
+        # 优化后能安排的课程反而变少时，保留原来的结果
+        if sum(search.active) < len(placements):
+            return placements, unplaced
+        
+        optimized = []
+        unplaced = []
+        for i, (course, teacher, length) in enumerate(items):
+            if not search.active[i]:
+                unplaced.append((course, teacher, length))
+                continue
+            classroom_id, slot = search.position(i)
+            optimized.append((course, teacher, classroom_by_id[classroom_id], self._time_slot(slot, length)))
+        return optimized, unplaced
+    
+    @staticmethod
+    def _time_slot(slot: int, length: int = 1) -> Dict:
+        day, period = slot_to_day_period(slot)
+        return {'day': day, 'period': period, 'slot': slot, 'length': length}
+        
+    def _find_available_block(self, teacher: TeacherData, rooms: List[ClassroomData], length: int,
+                              course_mask: int, occupancy: OccupancyIndex) -> Optional[Tuple[ClassroomData, Dict]]:
+        """
+        按教室顺序查找教师和教室能同时连续空闲 length 节的第一个时间段，
+        优先选择本课程（course_mask）还没有安排的那几天
+        """
+        busy_days = days_mask(course_mask)
+        fallback = None
+        for room in rooms:
+            starts = occupancy.free_block_starts(teacher.id, room.id, length)
+            if not starts:
+                continue
+            preferred = starts & ~busy_days
+            if preferred:
+                return room, self._time_slot(lowest_slot(preferred), length)
+            if fallback is None:
+                fallback = room, self._time_slot(lowest_slot(starts), length)
+        return fallback
         
     def check_conflicts(self, schedule: List[Dict]) -> List[Dict]:
-        """检查课表中的冲突"""
+        """检查课表中的冲突，每组在同一时间占用同一教室或同一教师的排课报告为一条冲突"""
         conflicts = []
+        if not schedule:
+            return conflicts
+        
+        columns = schedule_columns(schedule)
+        groups = find_conflict_groups(
+            columns['day'], columns['period'], columns['classroom_id'], columns['teacher_id']
+        )
         
         # 检查时间冲突
-        time_slots = {}
-        for item in schedule:
-            key = (item['day'], item['period'], item['classroom_id'])
-            if key in time_slots:
-                conflicts.append({
-                    'type': 'time_conflict',
-                    'message': f'教室 {item["classroom_name"]} 在周{item["day"]}第{item["period"]}节有冲突',
-                    'items': [time_slots[key], item]
-                })
-            else:
-                time_slots[key] = item
-                
+        for group in groups['classroom']:
+            items = [schedule[i] for i in group]
+            first = items[0]
+            conflicts.append({
+                'type': 'time_conflict',
+                'message': f'教室 {first["classroom_name"]} 在周{first["day"]}第{first["period"]}节有冲突',
+                'items': items
+            })
+        
         # 检查教师冲突
-        teacher_slots = {}
-        for item in schedule:
-            key = (item['day'], item['period'], item['teacher_id'])
-            if key in teacher_slots:
-                conflicts.append({
-                    'type': 'teacher_conflict',
-                    'message': f'教师 {item["teacher_name"]} 在周{item["day"]}第{item["period"]}节有冲突',
-                    'items': [teacher_slots[key], item]
-                })
-            else:
-                teacher_slots[key] = item
-                
-        return conflicts 
\ No newline at end of file
+        for group in groups['teacher']:
+            items = [schedule[i] for i in group]
+            first = items[0]
+            conflicts.append({
+                'type': 'teacher_conflict',
+                'message': f'教师 {first["teacher_name"]} 在周{first["day"]}第{first["period"]}节有冲突',
+                'items': items
+            })
+        
+        return conflicts
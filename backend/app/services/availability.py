@@ -0,0 +1,94 @@
+"""
+空闲时间查询
+
+一次查询取出相关教室和教师的全部已占用时间槽，在内存中用位图求空闲时间，
+不再逐个时间槽查询数据库。批量形式对多组 (教师, 教室) 也只查询一次。
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app.models.models import Schedule
+from app.services.occupancy import (
+    DAYS_PER_WEEK, PERIODS_PER_DAY, OccupancyIndex, lowest_slot, slot_index, slot_to_day_period
+)
+
+
+def load_occupancy(db: Session, classroom_ids: Iterable[int] = (), teacher_ids: Iterable[int] = (),
+                   exclude_schedule_id: Optional[int] = None) -> OccupancyIndex:
+    """
+    用一次查询加载指定教室、教师已占用的时间槽
+    exclude_schedule_id: 忽略这条排课（调整已有排课时，它原来的位置不算占用）
+    """
+    classroom_ids = list(set(classroom_ids))
+    teacher_ids = list(set(teacher_ids))
+    occupancy = OccupancyIndex()
+    if not classroom_ids and not teacher_ids:
+        return occupancy
+
+    conditions = []
+    if classroom_ids:
+        conditions.append(Schedule.classroom_id.in_(classroom_ids))
+    if teacher_ids:
+        conditions.append(Schedule.teacher_id.in_(teacher_ids))
+    query = db.query(Schedule.teacher_id, Schedule.classroom_id, Schedule.day, Schedule.period).filter(
+        or_(*conditions)
+    )
+    if exclude_schedule_id is not None:
+        query = query.filter(Schedule.id != exclude_schedule_id)
+
+    for teacher_id, classroom_id, day, period in query:
+        # 周课表网格之外的时间（周末、第9节以后）不参与空闲时间计算
+        if 1 <= day <= DAYS_PER_WEEK and 1 <= period <= PERIODS_PER_DAY:
+            occupancy.occupy(teacher_id, classroom_id, slot_index(day, period))
+    return occupancy
+
+
+def _slots(mask: int) -> List[Tuple[int, int]]:
+    slots = []
+    while mask:
+        slots.append(slot_to_day_period(lowest_slot(mask)))
+        mask &= mask - 1
+    return slots
+
+
+def free_slots(db: Session, classroom_id: int, teacher_id: int, length: int = 1,
+               exclude_schedule_id: Optional[int] = None) -> List[Tuple[int, int]]:
+    """教室和教师同时空闲的 (day, period) 列表；length 大于1时返回能连续空闲 length 节的起始时间"""
+    occupancy = load_occupancy(db, [classroom_id], [teacher_id], exclude_schedule_id)
+    return _slots(occupancy.free_block_starts(teacher_id, classroom_id, length))
+
+
+def batch_free_slots(db: Session, pairs: Sequence[Tuple[int, int]], length: int = 1,
+                     exclude_schedule_id: Optional[int] = None) -> Dict[Tuple[int, int], List[Tuple[int, int]]]:
+    """
+    批量查询：pairs 为 (teacher_id, classroom_id) 列表，一次查询得到每组的空闲 (day, period)
+    课程没有固定的授课教师，按课程查询时由调用方给出该课程的教师
+    """
+    occupancy = load_occupancy(db, [room for _, room in pairs], [teacher for teacher, _ in pairs],
+                               exclude_schedule_id)
+    return {
+        (teacher_id, classroom_id): _slots(occupancy.free_block_starts(teacher_id, classroom_id, length))
+        for teacher_id, classroom_id in pairs
+    }
+
+
+def slot_conflicts_statement(day: int, period: int, classroom_id: int, teacher_id: int,
+                             exclude_schedule_id: Optional[int] = None):
+    """查询与 (day, period, 教室, 教师) 冲突的排课的语句，同步和异步会话共用"""
+    statement = select(Schedule).where(
+        Schedule.day == day,
+        Schedule.period == period,
+        or_(Schedule.classroom_id == classroom_id, Schedule.teacher_id == teacher_id)
+    )
+    if exclude_schedule_id is not None:
+        statement = statement.where(Schedule.id != exclude_schedule_id)
+    return statement
+
+
+def slot_conflicts(db: Session, day: int, period: int, classroom_id: int, teacher_id: int,
+                   exclude_schedule_id: Optional[int] = None) -> List[Schedule]:
+    """与 (day, period, 教室, 教师) 冲突的排课，一次查询，走时间槽唯一索引"""
+    statement = slot_conflicts_statement(day, period, classroom_id, teacher_id, exclude_schedule_id)
+    return db.execute(statement).scalars().all()
@@ -0,0 +1,117 @@
+"""
+批量调整排课
+
+一次请求包含多个移动、交换操作，按顺序作用在内存中的工作副本上，
+得到最终状态后用实时占用索引一次性检查全部冲突（中间状态不检查，交换不会因为临时冲突被拒绝）；
+没有冲突时在一个事务中写入，有冲突时什么都不改，返回完整的冲突列表。
+写入时先把要调整的排课挪到不存在的节次（-id），再写最终位置，避免逐行更新时触发时间槽唯一约束。
+"""
+from collections import Counter
+from typing import Dict, Sequence
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.models import Classroom, Course, Schedule, Teacher
+from app.services import classroom_stats, schedule_changes
+from app.services.live_occupancy import live_occupancy
+from app.services.occupancy import in_grid
+
+_FIELDS = ('course_id', 'teacher_id', 'classroom_id', 'day', 'period')
+# 交换两条排课时互换的字段：时间和教室，课程和教师跟着排课走
+_SWAP_FIELDS = ('classroom_id', 'day', 'period')
+# 移动后引用的课程、教师、教室需要存在
+_REFERENCES = ((Course, 'course_id', '课程'), (Teacher, 'teacher_id', '教师'), (Classroom, 'classroom_id', '教室'))
+
+
+class BatchError(ValueError):
+    """操作本身无效（排课不存在、交换同一条排课等）"""
+
+
+def apply_batch(db: Session, operations: Sequence[Dict]) -> Dict:
+    """
+    执行一批操作，operation 为
+        {'op': 'move', 'id': 排课ID, 以及要修改的 course_id / teacher_id / classroom_id / day / period}
+        {'op': 'swap', 'id': 排课ID, 'other_id': 另一条排课ID}
+    返回 {'success': True, 'updated': [最终状态有变化的排课]}
+    或 {'success': False, 'conflicts': [...]}；操作无效时抛出 BatchError
+    """
+    ids = set()
+    for operation in operations:
+        ids.add(operation['id'])
+        if operation['op'] == 'swap':
+            if operation.get('other_id') is None:
+                raise BatchError("交换操作需要 other_id")
+            if operation['other_id'] == operation['id']:
+                raise BatchError(f"不能与自身交换: {operation['id']}")
+            ids.add(operation['other_id'])
+
+    # 锁定涉及的排课，直到事务结束
+    originals = {
+        row.id: {'id': row.id, **{field: getattr(row, field) for field in _FIELDS}}
+        for row in db.query(Schedule.id, *(getattr(Schedule, field) for field in _FIELDS))
+        .filter(Schedule.id.in_(ids)).with_for_update()
+    }
+    missing = sorted(ids - set(originals))
+    if missing:
+        db.rollback()
+        raise BatchError(f"排课不存在: {missing}")
+
+    working = {schedule_id: dict(row) for schedule_id, row in originals.items()}
+    for operation in operations:
+        row = working[operation['id']]
+        if operation['op'] == 'move':
+            row.update({field: operation[field] for field in _FIELDS if operation.get(field) is not None})
+        else:
+            other = working[operation['other_id']]
+            for field in _SWAP_FIELDS:
+                row[field], other[field] = other[field], row[field]
+
+    changed = [row for schedule_id, row in sorted(working.items()) if row != originals[schedule_id]]
+    # 只移动教室、教师时沿用原来的时间，原来的时间可能在网格之外
+    off_grid = [row['id'] for row in changed if not in_grid(row['day'], row['period'])]
+    if off_grid:
+        db.rollback()
+        raise BatchError(f"调整后的时间不在周课表网格内: {off_grid}")
+    if not changed:
+        db.rollback()
+        return {'success': True, 'updated': []}
+    _check_references(db, changed)
+
+    conflicts = live_occupancy.check_final(db, changed)
+    if conflicts:
+        db.rollback()
+        return {'success': False, 'conflicts': conflicts}
+
+    try:
+        db.bulk_update_mappings(Schedule, [{'id': row['id'], 'period': -row['id']} for row in changed])
+        db.bulk_update_mappings(Schedule, changed)
+        deltas = Counter()
+        for row in changed:
+            deltas[originals[row['id']]['classroom_id']] -= 1
+            deltas[row['classroom_id']] += 1
+        classroom_stats.apply_deltas(db, deltas)
+        schedule_changes.record(db, upserted=changed)
+        db.commit()
+    except IntegrityError:
+        # 检查之后其他请求抢先占用了某个位置
+        db.rollback()
+        return {'success': False, 'conflicts': [{
+            'type': 'time_conflict',
+            'message': '该时间段该教室或教师已被占用，请刷新后重试'
+        }]}
+    return {'success': True, 'updated': changed}
+
+
+def _check_references(db: Session, rows: Sequence[Dict]):
+    """每类引用用一条 IN 查询检查全部ID是否存在，否则外键错误会被当成时间冲突"""
+    errors = []
+    for model, field, noun in _REFERENCES:
+        wanted = {row[field] for row in rows}
+        found = {key for key, in db.query(model.id).filter(model.id.in_(wanted))}
+        missing = sorted(wanted - found)
+        if missing:
+            errors.append(f"{noun}不存在: {missing}")
+    if errors:
+        db.rollback()
+        raise BatchError("；".join(errors))
@@ -0,0 +1,105 @@
+"""
+课表变更推送
+
+每个提交的事务对课表的改动编成一条消息，带单调递增的序号 seq，保存在最近 N 条的环形缓冲中，
+通过 Server-Sent Events 推送给所有连接的浏览器：
+    {"seq": 12, "inserted": [排课...], "updated": [排课...], "deleted": [ID...]}
+整张课表被替换，或者客户端缺失的消息已经不在缓冲中（断开太久、服务重启）时推送
+    {"seq": 13, "reset": true}
+客户端收到 reset 后需要重新加载课表。断线重连时带上最后收到的序号（EventSource 会自动
+通过 Last-Event-ID 请求头发送），只补发缺失的消息。
+序号只在单个进程内有效，多进程部署时需要让推送连接固定到同一个进程。
+"""
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+
+from app.services import schedule_changes
+from app.services.schedule_changes import ScheduleChanges
+
+# 没有消息时发送心跳的间隔（秒），避免代理断开空闲连接
+HEARTBEAT_INTERVAL = 15
+
+
+def _message(seq: int, changes: ScheduleChanges) -> Dict:
+    if changes.replaced:
+        return {'seq': seq, 'reset': True}
+    rows = sorted(changes.upserted.values())
+    return {
+        'seq': seq,
+        'inserted': [row._asdict() for row in rows if row.id in changes.inserted],
+        'updated': [row._asdict() for row in rows if row.id not in changes.inserted],
+        'deleted': sorted(changes.deleted),
+    }
+
+
+class ChangeFeed:
+    """课表变更消息的序号分配、缓冲和推送"""
+
+    def __init__(self, buffer_size: int = 10000):
+        self._messages: Deque[Tuple[int, str]] = deque(maxlen=buffer_size)
+        self._seq = 0
+        self._lock = threading.Lock()
+        # 等待新消息的连接：(事件循环, asyncio.Event)
+        self._waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    @property
+    def seq(self) -> int:
+        """最近一条消息的序号"""
+        return self._seq
+
+    def publish(self, changes: ScheduleChanges):
+        """课表修改提交后调用（已订阅 schedule_changes），可以在任意线程中调用"""
+        with self._lock:
+            self._seq += 1
+            self._messages.append((self._seq, json.dumps(_message(self._seq, changes), ensure_ascii=False)))
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def since(self, seq: int) -> Tuple[List[Tuple[int, str]], bool]:
+        """
+        序号大于 seq 的消息；第二个返回值为 True 表示缺失的消息已经不在缓冲中
+        （或 seq 来自重启之前的进程），客户端需要重新加载
+        """
+        with self._lock:
+            if seq > self._seq or (self._messages and seq < self._messages[0][0] - 1):
+                return [], True
+            if not self._messages and seq < self._seq:
+                return [], True
+            return [(s, data) for s, data in self._messages if s > seq], False
+
+    async def stream(self, since: Optional[int], is_disconnected) -> AsyncIterator[str]:
+        """SSE 消息流；since 为 None 时只推送之后的新消息"""
+        event = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), event)
+        with self._lock:
+            self._waiters.add(waiter)
+            seq = self._seq if since is None else since
+        try:
+            yield f"retry: 3000\nevent: hello\ndata: {json.dumps({'seq': self.seq})}\n\n"
+            while not await is_disconnected():
+                event.clear()
+                messages, reset = self.since(seq)
+                if reset:
+                    seq = self.seq
+                    yield f"id: {seq}\nevent: schedule\ndata: {json.dumps({'seq': seq, 'reset': True})}\n\n"
+                    continue
+                for seq, data in messages:
+                    yield f"id: {seq}\nevent: schedule\ndata: {data}\n\n"
+                if messages:
+                    continue
+                try:
+                    await asyncio.wait_for(event.wait(), HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+
+change_feed = ChangeFeed(buffer_size=int(os.getenv("CHANGE_FEED_BUFFER", "10000")))
+schedule_changes.subscribe(change_feed.publish)
@@ -0,0 +1,126 @@
+"""
+教室统计
+
+使用情况和容量分布都由一条聚合 SQL 计算（GROUP BY、CASE 分段），不把教室逐个加载到 Python 中。
+classroom_stats 表保存每个教室的排课数量，所有修改课表的地方在同一个事务里增量更新它；
+设置 CLASSROOM_STATS_MATERIALIZED=1 后使用情况统计直接读这张表，不再扫描课表。
+"""
+import os
+from collections import Counter
+from typing import Any, Dict, Iterable, Mapping
+
+from sqlalchemy import case, delete, desc, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models.models import Classroom, ClassroomStats, Schedule
+
+MATERIALIZED = os.getenv("CLASSROOM_STATS_MATERIALIZED", "0") == "1"
+
+# 容量分组：(名称, 下限, 上限)，上限为 None 表示不设上限
+CAPACITY_GROUPS = [
+    ("0-50", None, 50),
+    ("51-100", 51, 100),
+    ("101-200", 101, 200),
+    ("201-500", 201, 500),
+    ("500+", 501, None),
+]
+
+
+def usage_stats(db: Session, materialized: bool = MATERIALIZED) -> Dict[str, Any]:
+    """教室使用情况：每个教室的排课数量及占全部排课的比例，按排课数量从多到少排列"""
+    if materialized:
+        schedule_count = func.coalesce(ClassroomStats.schedule_count, 0)
+        query = select(Classroom.id, Classroom.name, Classroom.capacity, Classroom.building, schedule_count) \
+            .outerjoin(ClassroomStats, ClassroomStats.classroom_id == Classroom.id)
+    else:
+        schedule_count = func.count(Schedule.id)
+        query = select(Classroom.id, Classroom.name, Classroom.capacity, Classroom.building, schedule_count) \
+            .outerjoin(Schedule, Schedule.classroom_id == Classroom.id) \
+            .group_by(Classroom.id, Classroom.name, Classroom.capacity, Classroom.building)
+    rows = db.execute(query.order_by(desc(schedule_count), Classroom.id)).all()
+
+    total_schedules = sum(row[4] for row in rows)
+    classroom_count = len(rows)
+    return {
+        "total_classrooms": classroom_count,
+        "total_schedules": total_schedules,
+        "average_schedules_per_classroom": total_schedules / classroom_count if classroom_count > 0 else 0,
+        "classroom_details": [
+            {
+                "id": row[0],
+                "name": row[1],
+                "capacity": row[2],
+                "building": row[3],
+                "schedule_count": row[4],
+                "usage_percentage": round(row[4] / total_schedules * 100, 2) if total_schedules > 0 else 0,
+            }
+            for row in rows
+        ],
+    }
+
+
+def capacity_stats(db: Session) -> Dict[str, Any]:
+    """教室容量统计：总数、总容量、平均容量和各容量段的教室数，一条聚合查询"""
+    buckets = []
+    for _, low, high in CAPACITY_GROUPS:
+        conditions = []
+        if low is not None:
+            conditions.append(Classroom.capacity >= low)
+        if high is not None:
+            conditions.append(Classroom.capacity <= high)
+        buckets.append(func.coalesce(func.sum(case((conditions[0] if len(conditions) == 1 else
+                                                    conditions[0] & conditions[1], 1), else_=0)), 0))
+    row = db.execute(select(
+        func.count(Classroom.id),
+        func.coalesce(func.sum(Classroom.capacity), 0),
+        func.coalesce(func.avg(Classroom.capacity), 0),
+        *buckets
+    )).one()
+    return {
+        "total_classrooms": row[0],
+        "total_capacity": int(row[1]),
+        "average_capacity": round(float(row[2]), 2),
+        "capacity_groups": {name: int(count) for (name, _, _), count in zip(CAPACITY_GROUPS, row[3:])},
+    }
+
+
+def apply_deltas(db: Session, deltas: Mapping[int, int]):
+    """按 {classroom_id: 排课数量变化} 增量更新统计表；不提交事务，随调用方的事务一起提交"""
+    deltas = {classroom_id: delta for classroom_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    existing = set(db.execute(
+        select(ClassroomStats.classroom_id).where(ClassroomStats.classroom_id.in_(list(deltas)))
+    ).scalars())
+    for classroom_id, delta in deltas.items():
+        if classroom_id in existing:
+            db.execute(
+                update(ClassroomStats)
+                .where(ClassroomStats.classroom_id == classroom_id)
+                .values(schedule_count=ClassroomStats.schedule_count + delta)
+            )
+    missing = [
+        {"classroom_id": classroom_id, "schedule_count": delta}
+        for classroom_id, delta in deltas.items() if classroom_id not in existing
+    ]
+    if missing:
+        db.execute(insert(ClassroomStats), missing)
+
+
+def replace_counts(db: Session, classroom_ids: Iterable[int]):
+    """整张课表被替换时重写统计表，classroom_ids 为新课表每条排课的教室；不提交事务"""
+    counts = Counter(classroom_ids)
+    db.execute(delete(ClassroomStats))
+    if counts:
+        db.execute(insert(ClassroomStats), [
+            {"classroom_id": classroom_id, "schedule_count": count} for classroom_id, count in counts.items()
+        ])
+
+
+def rebuild(db: Session):
+    """按现有课表重新计算统计表（用于直接修改过数据库之后）；不提交事务"""
+    db.execute(delete(ClassroomStats))
+    db.execute(insert(ClassroomStats).from_select(
+        ["classroom_id", "schedule_count"],
+        select(Schedule.classroom_id, func.count(Schedule.id)).group_by(Schedule.classroom_id)
+    ))
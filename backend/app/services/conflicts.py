@@ -0,0 +1,52 @@
+"""
+向量化冲突检测
+
+把课表编码为整数数组，将 (day, period, classroom_id) 和 (day, period, teacher_id)
+分别压缩成一个 int64 复合键，排序后找出重复的键，每组重复键就是一组冲突。
+"""
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+# 复合键中节次和ID各自占用的取值范围
+_PERIOD_BASE = 64
+_ID_BITS = 40
+
+
+def composite_keys(days: np.ndarray, periods: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """将 (day, period, id) 编码为一个 int64 键"""
+    slots = days.astype(np.int64) * _PERIOD_BASE + periods.astype(np.int64)
+    return (slots << _ID_BITS) | ids.astype(np.int64)
+
+
+def duplicate_groups(keys: np.ndarray) -> List[np.ndarray]:
+    """返回键重复的行下标分组（每组至少两行，组内保持原始顺序）"""
+    if keys.size == 0:
+        return []
+    order = np.argsort(keys, kind='stable')
+    _, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+    dup = counts > 1
+    return [order[start:start + count] for start, count in zip(starts[dup], counts[dup])]
+
+
+def find_conflict_groups(days: Sequence[int], periods: Sequence[int],
+                         classroom_ids: Sequence[int], teacher_ids: Sequence[int]) -> Dict[str, List[np.ndarray]]:
+    """
+    查找教室冲突和教师冲突
+    返回 {'classroom': [...], 'teacher': [...]}，每个元素是一组互相冲突的行下标
+    """
+    days = np.asarray(days, dtype=np.int64)
+    periods = np.asarray(periods, dtype=np.int64)
+    return {
+        'classroom': duplicate_groups(composite_keys(days, periods, np.asarray(classroom_ids, dtype=np.int64))),
+        'teacher': duplicate_groups(composite_keys(days, periods, np.asarray(teacher_ids, dtype=np.int64))),
+    }
+
+
+def schedule_columns(schedule: List[Dict]) -> Dict[str, np.ndarray]:
+    """把课表字典列表转换为整数列数组"""
+    n = len(schedule)
+    return {
+        field: np.fromiter((item[field] for item in schedule), dtype=np.int64, count=n)
+        for field in ('day', 'period', 'classroom_id', 'teacher_id')
+    }
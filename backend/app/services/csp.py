@@ -0,0 +1,251 @@
+"""
+约束传播回溯求解器
+
+变量为待排的一次课（可以是连续几节），值域为 (起始时间槽, 教室) 的组合，
+每个变量的值域按教室保存为起始时间槽位图。
+搜索采用 MRV 变量排序、前向检查 (forward checking) 以及冲突导向回跳
+(conflict-directed backjumping, FC-CBJ)，并带有墙钟时间预算：
+预算耗尽或问题无完整解时返回搜索过程中最好的部分解，剩余变量再贪心补排。
+"""
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from app.services.occupancy import OccupancyIndex, block_mask, lowest_slot
+
+# 每搜索多少个节点检查一次时间预算
+_CLOCK_CHECK_INTERVAL = 256
+
+
+class _Frame:
+    """搜索栈中的一层：当前变量、剩余候选值、当前取值及其造成的值域删减"""
+    __slots__ = ('var', 'values', 'value', 'reductions')
+
+    def __init__(self, var: int, values):
+        self.var = var
+        self.values = values
+        self.value: Optional[Tuple[int, int]] = None
+        self.reductions: List[Tuple[int, int, int]] = []
+
+
+class CSPSolver:
+    """
+    排课约束满足问题求解器
+
+    variables: 每个变量为 (teacher_id, [classroom_id, ...])，教室按优先顺序排列
+    lengths: 可选，每个变量连续占用的节数（默认都是1节）
+    occupancy: 已有占用（例如固定不动的课程），求解结果不会与其冲突
+    progress: 可选的进度回调，参数为 0~1 之间的已用时间比例
+    """
+
+    def __init__(self, variables: Sequence[Tuple[int, Sequence[int]]],
+                 occupancy: Optional[OccupancyIndex] = None,
+                 time_limit: float = 5.0,
+                 progress: Optional[Callable[[float], None]] = None,
+                 lengths: Optional[Sequence[int]] = None):
+        self.time_limit = time_limit
+        self.progress = progress
+        self.occupancy = occupancy or OccupancyIndex()
+        self.teachers = [teacher_id for teacher_id, _ in variables]
+        self.rooms = [list(rooms) for _, rooms in variables]
+        self.lengths = list(lengths) if lengths is not None else [1] * len(variables)
+
+        n = len(variables)
+        self.domains: List[List[int]] = []
+        self.dom_size = [0] * n
+        self.teacher_vars: Dict[int, List[int]] = {}
+        self.room_vars: Dict[int, List[Tuple[int, int]]] = {}
+        for v in range(n):
+            masks = [self.occupancy.free_block_starts(self.teachers[v], room_id, self.lengths[v])
+                     for room_id in self.rooms[v]]
+            self.domains.append(masks)
+            self.dom_size[v] = sum(bin(m).count('1') for m in masks)
+            self.teacher_vars.setdefault(self.teachers[v], []).append(v)
+            for idx, room_id in enumerate(self.rooms[v]):
+                self.room_vars.setdefault(room_id, []).append((v, idx))
+
+        self.past_fc: List[List[int]] = [[] for _ in range(n)]
+        self.conf_set: List[Set[int]] = [set() for _ in range(n)]
+        self.depth = [-1] * n
+        self.future: Set[int] = set()
+        self.nodes = 0
+
+    def solve(self) -> Dict:
+        """
+        求解并返回结果字典：
+        assignment 为 {变量下标: (起始时间槽, classroom_id)}，
+        complete 表示是否所有变量都已安排，timed_out 表示是否因时间预算耗尽而停止
+        """
+        started = time.monotonic()
+        deadline = started + self.time_limit
+        self.future = {v for v in range(len(self.domains)) if self.dom_size[v] > 0}
+        best: Dict[int, Tuple[int, int]] = {}
+        stack: List[_Frame] = []
+        timed_out = False
+
+        if self.future:
+            stack.append(self._push(self._select()))
+
+        while stack:
+            self.nodes += 1
+            if self.nodes % _CLOCK_CHECK_INTERVAL == 0:
+                now = time.monotonic()
+                if now > deadline:
+                    timed_out = True
+                    break
+                if self.progress is not None:
+                    self.progress((now - started) / self.time_limit)
+
+            frame = stack[-1]
+            if self._assign_next(frame):
+                if not self.future:
+                    break
+                stack.append(self._push(self._select()))
+                continue
+
+            # 当前变量值域已穷尽：记录部分解后回跳到冲突集中最深的变量
+            if len(stack) - 1 > len(best):
+                best = self._snapshot(stack)
+            var = frame.var
+            jump_set = self.conf_set[var] | set(self.past_fc[var])
+            stack.pop()
+            self._release(var)
+            if not jump_set:
+                break
+            target = max(jump_set, key=lambda u: self.depth[u])
+            self.conf_set[target] |= jump_set - {target}
+            while stack[-1].var != target:
+                popped = stack.pop()
+                self._undo(popped)
+                self._release(popped.var)
+            self._undo(stack[-1])
+
+        current = self._snapshot(stack)
+        if len(current) > len(best):
+            best = current
+
+        assignment = self._complete_greedily(best)
+        return {
+            'assignment': assignment,
+            'complete': len(assignment) == len(self.domains),
+            'timed_out': timed_out,
+            'nodes': self.nodes,
+        }
+
+    def _select(self) -> int:
+        """MRV：选择剩余值域最小的变量"""
+        return min(self.future, key=self.dom_size.__getitem__)
+
+    def _push(self, var: int) -> _Frame:
+        self.future.discard(var)
+        self.depth[var] = 0
+        return _Frame(var, self._values(var))
+
+    def _release(self, var: int):
+        """变量出栈，重新成为待安排变量"""
+        self.depth[var] = -1
+        self.conf_set[var].clear()
+        self.future.add(var)
+
+    def _values(self, var: int):
+        """按教室优先顺序、时间槽从早到晚枚举候选值"""
+        for idx, mask in enumerate(list(self.domains[var])):
+            while mask:
+                slot = lowest_slot(mask)
+                mask &= mask - 1
+                yield slot, idx
+
+    def _assign_next(self, frame: _Frame) -> bool:
+        """为当前变量尝试下一个候选值，前向检查通过则返回 True"""
+        var = frame.var
+        for slot, idx in frame.values:
+            if self._forward_check(frame, slot, idx):
+                frame.value = (slot, idx)
+                self.depth[var] = self.nodes
+                return True
+        return False
+
+    def _conflicting_starts(self, occupied: int, length: int) -> int:
+        """长度为 length 的课程中，与 occupied 中的时间槽重叠的起始时间槽"""
+        starts = occupied
+        for k in range(1, length):
+            starts |= occupied >> k
+        return starts
+
+    def _forward_check(self, frame: _Frame, slot: int, idx: int) -> bool:
+        """从未安排变量的值域中删去与 (slot 开始的连续几节, 教室) 冲突的值，出现空值域则撤销并返回 False"""
+        var = frame.var
+        occupied = block_mask(slot, self.lengths[var])
+        reduced: Dict[int, None] = {}
+        reductions = frame.reductions
+
+        # 同一教师的其他课程不能再使用这些时间槽
+        for other in self.teacher_vars[self.teachers[var]]:
+            if other not in self.future:
+                continue
+            conflicting = self._conflicting_starts(occupied, self.lengths[other])
+            masks = self.domains[other]
+            for j, mask in enumerate(masks):
+                removed = mask & conflicting
+                if removed:
+                    masks[j] = mask & ~removed
+                    self.dom_size[other] -= bin(removed).count('1')
+                    reductions.append((other, j, removed))
+                    reduced[other] = None
+
+        # 同一教室在这些时间槽不能再安排其他课程
+        for other, j in self.room_vars[self.rooms[var][idx]]:
+            if other not in self.future:
+                continue
+            mask = self.domains[other][j]
+            removed = mask & self._conflicting_starts(occupied, self.lengths[other])
+            if removed:
+                self.domains[other][j] = mask & ~removed
+                self.dom_size[other] -= bin(removed).count('1')
+                reductions.append((other, j, removed))
+                reduced[other] = None
+
+        for other in reduced:
+            self.past_fc[other].append(var)
+        for other in reduced:
+            if self.dom_size[other] == 0:
+                self._undo(frame)
+                self.conf_set[var].update(self.past_fc[other])
+                return False
+        return True
+
+    def _undo(self, frame: _Frame):
+        """撤销当前取值造成的值域删减"""
+        touched: Dict[int, None] = {}
+        for other, j, removed in frame.reductions:
+            self.domains[other][j] |= removed
+            self.dom_size[other] += bin(removed).count('1')
+            touched[other] = None
+        for other in touched:
+            self.past_fc[other].pop()
+        frame.reductions = []
+        frame.value = None
+
+    def _snapshot(self, frames: List[_Frame]) -> Dict[int, Tuple[int, int]]:
+        return {
+            f.var: (f.value[0], self.rooms[f.var][f.value[1]])
+            for f in frames if f.value is not None
+        }
+
+    def _complete_greedily(self, partial: Dict[int, Tuple[int, int]]) -> Dict[int, Tuple[int, int]]:
+        """在部分解的基础上，为剩余变量贪心地寻找空闲位置"""
+        occupancy = OccupancyIndex()
+        occupancy.room_masks = dict(self.occupancy.room_masks)
+        occupancy.teacher_masks = dict(self.occupancy.teacher_masks)
+        assignment = dict(partial)
+        for var, (slot, room_id) in assignment.items():
+            occupancy.occupy(self.teachers[var], room_id, slot, self.lengths[var])
+        for var in range(len(self.domains)):
+            if var in assignment:
+                continue
+            for room_id in self.rooms[var]:
+                slot = occupancy.find_first_free_block(self.teachers[var], room_id, self.lengths[var])
+                if slot is not None:
+                    occupancy.occupy(self.teachers[var], room_id, slot, self.lengths[var])
+                    assignment[var] = (slot, room_id)
+                    break
+        return assignment
@@ -0,0 +1,150 @@
+"""
+CSV 流式导入
+
+上传的文件按块读取、增量解码，csv 模块逐行解析，攒够一批后写入数据库并提交，
+内存中只保留当前这一批记录，与文件大小无关。
+指定唯一键（例如 Course.code、Classroom.name）时按键 upsert：已存在的记录更新，不存在的插入。
+某一行数据无效时只跳过该行，并在结果中报告行号和原因。
+"""
+import codecs
+import csv
+import os
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+# 每批写入的行数
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+# 每次从上传文件读取的字节数
+READ_CHUNK_SIZE = 64 * 1024
+# 结果中最多报告的错误行数，超出部分只计数
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportFormatError(ValueError):
+    """文件本身无法导入（编码错误、缺少必要的列）"""
+
+
+def iter_lines(fileobj: BinaryIO, encoding: str = "utf-8-sig",
+               chunk_size: int = READ_CHUNK_SIZE) -> Iterator[str]:
+    """按块读取二进制文件并增量解码，逐行返回（保留换行符，供 csv 模块处理引号内的换行）"""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ""
+    while True:
+        chunk = fileobj.read(chunk_size)
+        try:
+            pending += decoder.decode(chunk, final=not chunk)
+        except UnicodeDecodeError:
+            raise ImportFormatError("文件编码不是 UTF-8")
+        # 最后一段可能不是完整的一行，留到下一块
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+        if not chunk:
+            break
+    if pending:
+        yield pending
+
+
+def iter_rows(fileobj: BinaryIO, required: Sequence[str]) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """逐行解析 CSV，返回 (行号, 行数据)；表头缺少 required 中的列时抛出 ImportFormatError"""
+    reader = csv.DictReader(iter_lines(fileobj))
+    missing = [field for field in required if field not in (reader.fieldnames or [])]
+    if missing:
+        raise ImportFormatError(f"CSV文件缺少必要字段: {', '.join(missing)}")
+    for row in reader:
+        yield reader.line_num, row
+
+
+def upsert_batch(db: Session, model, records: List[Dict], key: Optional[str] = None) -> Tuple[int, int]:
+    """
+    写入一批记录，返回 (新增数, 更新数)；不提交事务
+    key 为唯一键字段，为 None 时全部插入；同一批中唯一键重复时以最后一行为准
+    """
+    if key is None:
+        db.execute(insert(model.__table__), records)
+        return len(records), 0
+
+    by_key = {record[key]: record for record in records}
+    column = getattr(model, key)
+    existing = dict(db.query(column, model.id).filter(column.in_(list(by_key))))
+    inserts = [record for value, record in by_key.items() if value not in existing]
+    updates = [dict(record, id=existing[value]) for value, record in by_key.items() if value in existing]
+    if inserts:
+        db.execute(insert(model.__table__), inserts)
+    if updates:
+        db.bulk_update_mappings(model, updates)
+    return len(inserts), len(updates)
+
+
+def import_csv(db: Session, fileobj: BinaryIO, model, parse: Callable[[Dict[str, str]], Dict],
+               required: Sequence[str], key: Optional[str] = None,
+               batch_size: int = IMPORT_BATCH_SIZE) -> Dict:
+    """
+    流式导入 CSV
+    parse: 把一行 CSV 转换为模型字段字典，数据无效时抛出 ValueError（或 KeyError）
+    返回 {'inserted', 'updated', 'failed', 'errors': [{'line', 'error'}], 'errors_truncated'}
+    """
+    result = {'inserted': 0, 'updated': 0, 'failed': 0, 'errors': [], 'errors_truncated': False}
+
+    def report(line: int, error: str):
+        result['failed'] += 1
+        if len(result['errors']) < MAX_REPORTED_ERRORS:
+            result['errors'].append({'line': line, 'error': error})
+        else:
+            result['errors_truncated'] = True
+
+    batch: List[Tuple[int, Dict]] = []
+
+    def flush():
+        if not batch:
+            return
+        try:
+            inserted, updated = upsert_batch(db, model, [record for _, record in batch], key)
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            for line, _ in batch:
+                report(line, f"写入数据库失败: {e.__class__.__name__}: {getattr(e, 'orig', e)}")
+        else:
+            result['inserted'] += inserted
+            result['updated'] += updated
+        batch.clear()
+
+    line = 1
+    try:
+        for line, row in iter_rows(fileobj, required):
+            try:
+                record = parse(row)
+            except KeyError as e:
+                report(line, f"缺少字段: {e.args[0]}")
+                continue
+            except (TypeError, ValueError) as e:
+                report(line, str(e))
+                continue
+            batch.append((line, record))
+            if len(batch) >= batch_size:
+                flush()
+    except ImportFormatError as e:
+        # 表头有问题时整个文件无法导入；读到中途才出错时保留已导入的部分，其余内容不再处理
+        if line == 1:
+            raise
+        report(line + 1, f"{e}，之后的内容未导入")
+    except csv.Error as e:
+        if line == 1:
+            raise ImportFormatError(f"CSV格式错误: {e}")
+        report(line + 1, f"CSV格式错误: {e}，之后的内容未导入")
+    flush()
+    return result
+
+
+def import_message(result: Dict, noun: str) -> str:
+    """导入结果的提示信息，noun 为数据名称（例如"课程"）"""
+    message = f"成功导入 {result['inserted'] + result['updated']} 条{noun}数据"
+    if result['updated']:
+        message += f"（其中更新 {result['updated']} 条）"
+    if result['failed']:
+        message += f"，{result['failed']} 行导入失败"
+    return message
@@ -0,0 +1,130 @@
+"""
+后台任务
+
+耗时的排课任务提交到工作线程池中执行，请求立即返回任务ID，
+之后通过任务ID查询进度、获取结果或取消任务。
+取消是协作式的：任务在汇报进度时检查取消标记，并抛出 JobCancelled 结束执行。
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+PENDING = 'pending'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """任务被取消"""
+
+
+class Job:
+    """一个后台任务的状态"""
+
+    def __init__(self, job_id: str):
+        self.id = job_id
+        self.status = PENDING
+        self.progress = 0.0
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.future = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def set_progress(self, fraction: float):
+        """汇报进度 (0~1)；已请求取消时抛出 JobCancelled"""
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+        self.progress = max(self.progress, min(fraction, 1.0))
+
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'progress': round(self.progress, 4),
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    任务管理器
+    max_workers: 同时执行的任务数
+    max_finished: 最多保留多少个已结束的任务，超出后最早结束的任务被丢弃
+    """
+
+    def __init__(self, max_workers: int = 2, max_finished: int = 100):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.max_finished = max_finished
+        self.jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Job:
+        """提交任务，fn 的第一个参数为 Job 对象，用于汇报进度"""
+        job = Job(uuid.uuid4().hex)
+        with self.lock:
+            self.jobs[job.id] = job
+            self._prune()
+        job.future = self.executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """请求取消任务：尚未开始的任务直接取消，运行中的任务在下一次汇报进度时停止"""
+        job = self.get(job_id)
+        if job is None or job.status in FINISHED_STATUSES:
+            return job
+        job._cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            self._finish(job, CANCELLED)
+        return job
+
+    def _run(self, job: Job, fn: Callable[..., Any], args, kwargs):
+        if job.cancel_requested:
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = fn(job, *args, **kwargs)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            job.error = str(e)
+            self._finish(job, FAILED)
+        else:
+            job.progress = 1.0
+            self._finish(job, SUCCEEDED)
+
+    def _finish(self, job: Job, status: str):
+        job.status = status
+        job.finished_at = time.time()
+
+    def _prune(self):
+        """丢弃最早结束的任务，保证保留的已结束任务不超过上限"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in FINISHED_STATUSES]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job_id]
+
+
+job_manager = JobManager(max_workers=int(os.getenv("JOB_WORKERS", "2")))
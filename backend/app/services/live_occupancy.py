@@ -0,0 +1,130 @@
+"""
+实时占用索引
+
+内存中按 (教室, 周几, 节次)、(教师, 周几, 节次) 索引整张已提交的课表（ScheduleMirror，
+随课表修改增量更新），检查一次调整是否冲突只需两次字典查找，不访问数据库；
+周课表网格内的占用同时记在 OccupancyIndex 的位图中，一次位运算即可求出拖动一条排课时
+所有可以放下的位置。最终写入仍由数据库的时间槽唯一约束兜底。
+"""
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.services.occupancy import (
+    OccupancyIndex, block_starts, FULL_MASK, in_grid, lowest_slot, slot_index, slot_to_day_period
+)
+from app.services.schedule_changes import ScheduleMirror, ScheduleRow
+
+
+class LiveOccupancy(ScheduleMirror):
+    """已提交课表的教室、教师占用索引"""
+
+    def __init__(self, max_age: float = 300):
+        self._rooms: Dict[Tuple[int, int, int], int] = {}
+        self._teachers: Dict[Tuple[int, int, int], int] = {}
+        self._occupancy = OccupancyIndex()
+        super().__init__(max_age)
+
+    def _reset(self):
+        self._rooms = {}
+        self._teachers = {}
+        self._occupancy = OccupancyIndex()
+
+    def _added(self, row: ScheduleRow):
+        self._rooms[(row.classroom_id, row.day, row.period)] = row.id
+        self._teachers[(row.teacher_id, row.day, row.period)] = row.id
+        if in_grid(row.day, row.period):
+            self._occupancy.occupy(row.teacher_id, row.classroom_id, slot_index(row.day, row.period))
+
+    def _removed(self, row: ScheduleRow):
+        if self._rooms.get((row.classroom_id, row.day, row.period)) == row.id:
+            del self._rooms[(row.classroom_id, row.day, row.period)]
+        if self._teachers.get((row.teacher_id, row.day, row.period)) == row.id:
+            del self._teachers[(row.teacher_id, row.day, row.period)]
+        if in_grid(row.day, row.period):
+            self._occupancy.release(row.teacher_id, row.classroom_id, slot_index(row.day, row.period))
+
+    def row(self, db: Session, schedule_id: int) -> Optional[ScheduleRow]:
+        with self.loaded_lock(db):
+            return self._rows.get(schedule_id)
+
+    def _conflicts(self, candidate: Dict) -> List[Dict]:
+        day, period = candidate['day'], candidate['period']
+        exclude = candidate.get('id')
+        conflicts = []
+        occupant = self._rooms.get((candidate['classroom_id'], day, period))
+        if occupant is not None and occupant != exclude:
+            conflicts.append({
+                'type': 'time_conflict',
+                'schedule_id': occupant,
+                'message': f'教室在周{day}第{period}节已被占用'
+            })
+        occupant = self._teachers.get((candidate['teacher_id'], day, period))
+        if occupant is not None and occupant != exclude:
+            conflicts.append({
+                'type': 'teacher_conflict',
+                'schedule_id': occupant,
+                'message': f'教师在周{day}第{period}节已有其他课程'
+            })
+        return conflicts
+
+    def check(self, db: Session, candidates: Sequence[Dict]) -> List[List[Dict]]:
+        """
+        批量检查候选位置，candidate 需要 day、period、teacher_id、classroom_id，
+        id 为被调整的排课（它原来的位置不算冲突）；每个候选位置单独与已提交的课表比较，
+        返回与 candidates 一一对应的冲突列表
+        """
+        with self.loaded_lock(db):
+            return [self._conflicts(candidate) for candidate in candidates]
+
+    def check_final(self, db: Session, rows: Sequence[Dict]) -> List[Dict]:
+        """
+        一次检查一组排课调整后的最终位置：这组排课原来的位置都视为空闲，
+        每条与其余已提交的排课比较，组内也互相比较；返回全部冲突，conflict['id'] 为被调整的排课
+        """
+        ids = {row['id'] for row in rows}
+        rooms: Dict[Tuple[int, int, int], int] = {}
+        teachers: Dict[Tuple[int, int, int], int] = {}
+        conflicts = []
+        with self.loaded_lock(db):
+            for row in rows:
+                day, period = row['day'], row['period']
+                for kind, key, index, claimed, message in (
+                    ('time_conflict', (row['classroom_id'], day, period), self._rooms, rooms,
+                     f'教室在周{day}第{period}节已被占用'),
+                    ('teacher_conflict', (row['teacher_id'], day, period), self._teachers, teachers,
+                     f'教师在周{day}第{period}节已有其他课程'),
+                ):
+                    occupant = index.get(key)
+                    if occupant is None or occupant in ids:
+                        occupant = claimed.setdefault(key, row['id'])
+                    if occupant != row['id']:
+                        conflicts.append({'id': row['id'], 'type': kind, 'schedule_id': occupant, 'message': message})
+        return conflicts
+
+    def drop_targets(self, db: Session, teacher_id: int, classroom_id: int,
+                     exclude_schedule_id: Optional[int] = None, length: int = 1) -> List[Tuple[int, int]]:
+        """
+        教师和教室同时空闲、可以放下连续 length 节的所有 (day, period)；
+        exclude_schedule_id 为被拖动的排课，它当前占用的位置视为空闲
+        """
+        with self.loaded_lock(db):
+            room_mask = self._occupancy.room_masks.get(classroom_id, 0)
+            teacher_mask = self._occupancy.teacher_masks.get(teacher_id, 0)
+            row = self._rows.get(exclude_schedule_id) if exclude_schedule_id is not None else None
+            if row is not None and in_grid(row.day, row.period):
+                bit = 1 << slot_index(row.day, row.period)
+                if row.classroom_id == classroom_id:
+                    room_mask &= ~bit
+                if row.teacher_id == teacher_id:
+                    teacher_mask &= ~bit
+        starts = block_starts(FULL_MASK & ~(room_mask | teacher_mask), length)
+        targets = []
+        while starts:
+            targets.append(slot_to_day_period(lowest_slot(starts)))
+            starts &= starts - 1
+        return targets
+
+
+live_occupancy = LiveOccupancy(max_age=float(os.getenv("LIVE_OCCUPANCY_MAX_AGE", "300")))
@@ -0,0 +1,271 @@
+"""
+局部搜索优化器（模拟退火）
+
+在已生成的课表上反复尝试"移动"（把一条排课换到别的时间槽/教室）和"交换"
+（交换两条排课的位置），以降低以下代价：
+教室冲突、教师冲突、教师单日课时超限、教师一天内的空堂。
+
+所有计数器都保存在按 (教室/教师, 时间槽) 下标的扁平列表中，
+每次移动只更新受影响的几个计数器并据此得到代价增量，不需要重新扫描整张课表。
+"""
+import math
+import random
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.services.occupancy import DAYS_PER_WEEK, PERIODS_PER_DAY, SLOT_COUNT
+
+# 各项代价的权重：冲突远重于软约束
+DEFAULT_WEIGHTS = {
+    'room_conflict': 1000,
+    'teacher_conflict': 1000,
+    'daily_overload': 10,
+    'gap': 1,
+}
+
+# 教师每天最多安排的课时数
+DEFAULT_MAX_DAILY_PERIODS = 4
+
+# 每个"一天的节次位图"对应的空堂数（最早与最晚一节之间的空闲节数）
+_GAPS = [
+    0 if mask == 0 else mask.bit_length() - (mask & -mask).bit_length() + 1 - bin(mask).count('1')
+    for mask in range(1 << PERIODS_PER_DAY)
+]
+
+_CLOCK_CHECK_INTERVAL = 1024
+
+
+class LocalSearch:
+    """
+    entries: 每条排课为 (teacher_id, classroom_id, 起始时间槽)
+    rooms_for: 每条排课可以使用的教室ID列表
+    lengths: 可选，每条排课连续占用的节数（默认都是1节），移动时整段一起移动且不跨天
+    """
+
+    def __init__(self, entries: Sequence[Tuple[int, int, int]], rooms_for: Sequence[Sequence[int]],
+                 max_daily_periods: int = DEFAULT_MAX_DAILY_PERIODS,
+                 weights: Optional[Dict[str, int]] = None,
+                 rng: Optional[random.Random] = None,
+                 lengths: Optional[Sequence[int]] = None):
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.max_daily = max_daily_periods
+        self.rng = rng or random.Random()
+
+        room_ids = sorted({room_id for rooms in rooms_for for room_id in rooms} |
+                          {room_id for _, room_id, _ in entries})
+        teacher_ids = sorted({teacher_id for teacher_id, _, _ in entries})
+        self.room_ids = room_ids
+        room_pos = {room_id: i for i, room_id in enumerate(room_ids)}
+        teacher_pos = {teacher_id: i for i, teacher_id in enumerate(teacher_ids)}
+
+        self.teacher = [teacher_pos[teacher_id] for teacher_id, _, _ in entries]
+        self.room = [room_pos[room_id] for _, room_id, _ in entries]
+        self.slot = [slot for _, _, slot in entries]
+        self.length = list(lengths) if lengths is not None else [1] * len(entries)
+        self.rooms_for = [[room_pos[room_id] for room_id in rooms] or [self.room[i]]
+                          for i, rooms in enumerate(rooms_for)]
+        self.active = [True] * len(entries)
+
+        self.room_count = [0] * (len(room_ids) * SLOT_COUNT)
+        self.teacher_count = [0] * (len(teacher_ids) * SLOT_COUNT)
+        self.day_load = [0] * (len(teacher_ids) * DAYS_PER_WEEK)
+        self.day_mask = [0] * (len(teacher_ids) * DAYS_PER_WEEK)
+        self.cost = 0
+        for i in range(len(entries)):
+            self.cost += self._add(i)
+
+    def _add(self, i: int) -> int:
+        """把第 i 条排课加入计数器，返回代价增量"""
+        if self.length[i] == 1:
+            return self._add_period(self.teacher[i], self.room[i], self.slot[i])
+        return sum(self._add_period(self.teacher[i], self.room[i], slot)
+                   for slot in range(self.slot[i], self.slot[i] + self.length[i]))
+
+    def _remove(self, i: int) -> int:
+        """把第 i 条排课从计数器中移除，返回代价增量"""
+        if self.length[i] == 1:
+            return self._remove_period(self.teacher[i], self.room[i], self.slot[i])
+        return sum(self._remove_period(self.teacher[i], self.room[i], slot)
+                   for slot in range(self.slot[i], self.slot[i] + self.length[i]))
+
+    def _add_period(self, t: int, room: int, slot: int) -> int:
+        """把一节课加入计数器，返回代价增量"""
+        w = self.weights
+        day, period = divmod(slot, PERIODS_PER_DAY)
+        delta = 0
+
+        k = room * SLOT_COUNT + slot
+        if self.room_count[k] >= 1:
+            delta += w['room_conflict']
+        self.room_count[k] += 1
+
+        k = t * SLOT_COUNT + slot
+        c = self.teacher_count[k]
+        self.teacher_count[k] = c + 1
+        if c >= 1:
+            delta += w['teacher_conflict']
+
+        d = t * DAYS_PER_WEEK + day
+        if self.day_load[d] >= self.max_daily:
+            delta += w['daily_overload']
+        self.day_load[d] += 1
+
+        if c == 0:
+            mask = self.day_mask[d]
+            new_mask = mask | (1 << period)
+            delta += w['gap'] * (_GAPS[new_mask] - _GAPS[mask])
+            self.day_mask[d] = new_mask
+        return delta
+
+    def _remove_period(self, t: int, room: int, slot: int) -> int:
+        """把一节课从计数器中移除，返回代价增量"""
+        w = self.weights
+        day, period = divmod(slot, PERIODS_PER_DAY)
+        delta = 0
+
+        k = room * SLOT_COUNT + slot
+        self.room_count[k] -= 1
+        if self.room_count[k] >= 1:
+            delta -= w['room_conflict']
+
+        k = t * SLOT_COUNT + slot
+        c = self.teacher_count[k] - 1
+        self.teacher_count[k] = c
+        if c >= 1:
+            delta -= w['teacher_conflict']
+
+        d = t * DAYS_PER_WEEK + day
+        self.day_load[d] -= 1
+        if self.day_load[d] >= self.max_daily:
+            delta -= w['daily_overload']
+
+        if c == 0:
+            mask = self.day_mask[d]
+            new_mask = mask & ~(1 << period)
+            delta += w['gap'] * (_GAPS[new_mask] - _GAPS[mask])
+            self.day_mask[d] = new_mask
+        return delta
+
+    def move(self, i: int, room: int, slot: int) -> int:
+        """把第 i 条排课移到 (教室下标, 起始时间槽)，返回代价增量"""
+        delta = self._remove(i)
+        self.room[i], self.slot[i] = room, slot
+        delta += self._add(i)
+        self.cost += delta
+        return delta
+
+    def swap(self, i: int, j: int) -> int:
+        """交换两条排课的起始时间槽（教室不变，两条排课的节数需要相同），返回代价增量"""
+        delta = self._remove(i) + self._remove(j)
+        self.slot[i], self.slot[j] = self.slot[j], self.slot[i]
+        delta += self._add(i) + self._add(j)
+        self.cost += delta
+        return delta
+
+    def has_conflict(self, i: int) -> bool:
+        """第 i 条排课是否与其他排课存在教室或教师冲突"""
+        room, teacher = self.room[i] * SLOT_COUNT, self.teacher[i] * SLOT_COUNT
+        return any(
+            self.room_count[room + slot] > 1 or self.teacher_count[teacher + slot] > 1
+            for slot in range(self.slot[i], self.slot[i] + self.length[i])
+        )
+
+    def random_start(self, i: int) -> int:
+        """为第 i 条排课随机选择一个不跨天的起始时间槽"""
+        day = self.rng.randrange(DAYS_PER_WEEK)
+        return day * PERIODS_PER_DAY + self.rng.randrange(PERIODS_PER_DAY - self.length[i] + 1)
+
+    def drop(self, i: int):
+        """从课表中去掉第 i 条排课"""
+        if self.active[i]:
+            self.cost += self._remove(i)
+            self.active[i] = False
+
+    def optimize(self, time_limit: float = 1.0, max_iterations: Optional[int] = None,
+                 initial_temperature: float = 20.0, final_temperature: float = 0.05,
+                 progress: Optional[Callable[[float], None]] = None) -> Dict:
+        """
+        模拟退火：在时间预算（或迭代次数上限）内随机尝试移动和交换，
+        代价不增则接受，代价增加时按 exp(-delta / T) 的概率接受，结束时回到最优状态
+        温度随已用时间（或迭代比例）从 initial_temperature 指数下降到 final_temperature
+        progress: 可选的进度回调，参数为 0~1 之间的进度
+        """
+        rng = self.rng
+        indices = [i for i in range(len(self.slot)) if self.active[i]]
+        result = {'initial_cost': self.cost, 'iterations': 0, 'accepted': 0}
+        if len(indices) < 2 or self.cost == 0:
+            result['final_cost'] = self.cost
+            return result
+
+        start = time.monotonic()
+        ratio = final_temperature / initial_temperature
+        temperature = initial_temperature
+        best_cost = self.cost
+        best_state = None  # None 表示当前状态就是最优状态
+        iterations = accepted = 0
+
+        while max_iterations is None or iterations < max_iterations:
+            iterations += 1
+            if iterations % _CLOCK_CHECK_INTERVAL == 0:
+                fraction = (time.monotonic() - start) / time_limit
+                if max_iterations:
+                    fraction = max(fraction, iterations / max_iterations)
+                if fraction >= 1:
+                    break
+                if progress is not None:
+                    progress(fraction)
+                temperature = initial_temperature * ratio ** fraction
+
+            i = indices[rng.randrange(len(indices))]
+            old_i = (self.room[i], self.slot[i])
+            if rng.random() < 0.5:
+                j = indices[rng.randrange(len(indices))]
+                if i == j or self.length[i] != self.length[j]:
+                    continue
+                old_j = (self.room[j], self.slot[j])
+                delta = self.swap(i, j)
+            else:
+                j = None
+                rooms = self.rooms_for[i]
+                delta = self.move(i, rooms[rng.randrange(len(rooms))], self.random_start(i))
+
+            if delta > 0 and rng.random() >= math.exp(-delta / temperature):
+                # 拒绝：撤销本次移动
+                if j is None:
+                    self.move(i, *old_i)
+                else:
+                    self.swap(i, j)
+                continue
+
+            accepted += 1
+            if self.cost <= best_cost:
+                best_cost = self.cost
+                best_state = None
+                if best_cost == 0:
+                    break
+            elif best_state is None:
+                # 离开最优状态之前保存它
+                best_state = (list(self.room), list(self.slot))
+                best_state[0][i], best_state[1][i] = old_i
+                if j is not None:
+                    best_state[0][j], best_state[1][j] = old_j
+
+        if best_state is not None:
+            self._restore(*best_state)
+
+        result.update(final_cost=self.cost, iterations=iterations, accepted=accepted)
+        return result
+
+    def _restore(self, rooms: List[int], slots: List[int]):
+        """恢复到保存的状态并重建计数器"""
+        for i in range(len(self.slot)):
+            if self.active[i]:
+                self.cost += self._remove(i)
+        self.room, self.slot = rooms, slots
+        for i in range(len(self.slot)):
+            if self.active[i]:
+                self.cost += self._add(i)
+
+    def position(self, i: int) -> Tuple[int, int]:
+        """第 i 条排课当前的 (classroom_id, 起始时间槽)"""
+        return self.room_ids[self.room[i]], self.slot[i]
@@ -0,0 +1,41 @@
+"""
+多起点并行排课
+
+用不同的随机种子在进程池中独立运行多次排课，按得分保留最好的一次。
+每次运行的种子都会返回，传入相同种子即可复现该次结果。
+"""
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+def make_seeds(runs: int, base_seed: Optional[int] = None) -> List[int]:
+    """生成各次运行使用的种子；指定 base_seed 时种子序列本身也可复现"""
+    rng = random.Random(base_seed) if base_seed is not None else random.SystemRandom()
+    return [rng.getrandbits(32) for _ in range(runs)]
+
+
+def multi_start(run: Callable[..., Dict], seeds: List[int], args: Tuple = (),
+                workers: Optional[int] = None,
+                progress: Optional[Callable[[float], None]] = None) -> Tuple[Dict, List[Dict]]:
+    """
+    在进程池中执行 run(seed, *args)，返回 (得分最高的结果, 每次运行的种子和得分)
+    run 必须是模块级函数，args 必须可以被 pickle；run 的返回值需要包含 'seed' 和 'score'
+    progress: 可选的进度回调，每完成一次运行调用一次；回调抛出异常时取消尚未开始的运行
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run, seed, *args) for seed in seeds]
+        try:
+            for done, _ in enumerate(as_completed(futures), 1):
+                if progress is not None:
+                    progress(done / len(futures))
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        results = [future.result() for future in futures]
+
+    # 得分相同时保留先运行的种子
+    best = max(results, key=lambda r: r['score'])
+    runs = [{'seed': r['seed'], 'score': r['score']} for r in results]
+    return best, runs
@@ -0,0 +1,135 @@
+from typing import Dict, Optional, Tuple
+
+# 周课表网格：周一到周五，每天8节课
+DAYS_PER_WEEK = 5
+PERIODS_PER_DAY = 8
+SLOT_COUNT = DAYS_PER_WEEK * PERIODS_PER_DAY
+FULL_MASK = (1 << SLOT_COUNT) - 1
+# 一天所有节次对应的位图
+DAY_MASK = (1 << PERIODS_PER_DAY) - 1
+
+# _START_MASKS[n]: 能连续安排 n 节而不跨天的起始时间槽
+_START_MASKS = [FULL_MASK] + [
+    sum(((1 << (PERIODS_PER_DAY - n + 1)) - 1) << (day * PERIODS_PER_DAY) for day in range(DAYS_PER_WEEK))
+    for n in range(1, PERIODS_PER_DAY + 1)
+]
+
+
+def slot_index(day: int, period: int) -> int:
+    """将 (day, period) 转换为位图中的时间槽编号"""
+    return (day - 1) * PERIODS_PER_DAY + (period - 1)
+
+
+def in_grid(day: int, period: int) -> bool:
+    """(day, period) 是否在周课表网格内；网格之外的时间没有对应的时间槽编号"""
+    return 1 <= day <= DAYS_PER_WEEK and 1 <= period <= PERIODS_PER_DAY
+
+
+def slot_to_day_period(slot: int) -> Tuple[int, int]:
+    """将时间槽编号转换回 (day, period)"""
+    day, period = divmod(slot, PERIODS_PER_DAY)
+    return day + 1, period + 1
+
+
+def lowest_slot(mask: int) -> int:
+    """返回位图中编号最小的时间槽，位图为空时返回 -1"""
+    return (mask & -mask).bit_length() - 1
+
+
+def block_mask(slot: int, length: int = 1) -> int:
+    """从 slot 开始连续 length 节对应的位图"""
+    return ((1 << length) - 1) << slot
+
+
+def block_starts(free: int, length: int) -> int:
+    """
+    滑动窗口查询：free 中能连续空闲 length 节（不跨天）的起始时间槽位图
+    把 free 依次右移 1..length-1 位求交集，第 i 位为 1 即表示 i..i+length-1 都空闲
+    """
+    if not 1 <= length <= PERIODS_PER_DAY:
+        return 0
+    starts = free & _START_MASKS[length]
+    for k in range(1, length):
+        starts &= free >> k
+    return starts
+
+
+def days_mask(mask: int) -> int:
+    """mask 中有时间槽被占用的那些天，扩展为整天的位图"""
+    days = 0
+    for day in range(DAYS_PER_WEEK):
+        day_bits = DAY_MASK << (day * PERIODS_PER_DAY)
+        if mask & day_bits:
+            days |= day_bits
+    return days
+
+
+class OccupancyIndex:
+    """
+    时间槽占用索引
+    每个教室、每位教师各对应一个整数位图，第 i 位为 1 表示第 i 个时间槽已被占用，
+    查找空闲时间槽只需一次位运算求交集再取最低位
+
+    room_positions: 可选的 教室ID -> 位置 映射（见 RoomIndex），提供时额外为每个时间槽
+    维护一个已占用教室位置的位图，用于查找某时间槽的空闲教室
+    """
+
+    def __init__(self, room_positions: Optional[Dict[int, int]] = None):
+        self.room_masks: Dict[int, int] = {}
+        self.teacher_masks: Dict[int, int] = {}
+        self.room_positions = room_positions
+        self.slot_room_masks: Dict[int, int] = {}
+
+    def free_mask(self, teacher_id: int, classroom_id: int) -> int:
+        """教师与教室同时空闲的时间槽位图"""
+        busy = self.room_masks.get(classroom_id, 0) | self.teacher_masks.get(teacher_id, 0)
+        return FULL_MASK & ~busy
+
+    def is_free(self, teacher_id: int, classroom_id: int, slot: int) -> bool:
+        """检查教师与教室在指定时间槽是否都空闲"""
+        return bool(self.free_mask(teacher_id, classroom_id) >> slot & 1)
+
+    def find_first_free(self, teacher_id: int, classroom_id: int) -> Optional[int]:
+        """查找教师与教室同时空闲的第一个时间槽，没有则返回 None"""
+        free = self.free_mask(teacher_id, classroom_id)
+        if not free:
+            return None
+        return lowest_slot(free)
+
+    def free_block_starts(self, teacher_id: int, classroom_id: int, length: int) -> int:
+        """教师与教室能同时连续空闲 length 节的起始时间槽位图"""
+        return block_starts(self.free_mask(teacher_id, classroom_id), length)
+
+    def find_first_free_block(self, teacher_id: int, classroom_id: int, length: int) -> Optional[int]:
+        """查找教师与教室能同时连续空闲 length 节的第一个起始时间槽，没有则返回 None"""
+        starts = self.free_block_starts(teacher_id, classroom_id, length)
+        if not starts:
+            return None
+        return lowest_slot(starts)
+
+    def occupy(self, teacher_id: int, classroom_id: int, slot: int, length: int = 1):
+        """标记从 slot 开始连续 length 个时间槽被占用"""
+        bits = block_mask(slot, length)
+        self.room_masks[classroom_id] = self.room_masks.get(classroom_id, 0) | bits
+        self.teacher_masks[teacher_id] = self.teacher_masks.get(teacher_id, 0) | bits
+        if self.room_positions is not None and classroom_id in self.room_positions:
+            room_bit = 1 << self.room_positions[classroom_id]
+            for s in range(slot, slot + length):
+                self.slot_room_masks[s] = self.slot_room_masks.get(s, 0) | room_bit
+
+    def block_teacher(self, teacher_id: int, slot: int):
+        """标记教师在指定时间槽不可用"""
+        self.teacher_masks[teacher_id] = self.teacher_masks.get(teacher_id, 0) | (1 << slot)
+
+    def release(self, teacher_id: int, classroom_id: int, slot: int, length: int = 1):
+        """释放从 slot 开始连续 length 个被占用的时间槽"""
+        keep = ~block_mask(slot, length)
+        if classroom_id in self.room_masks:
+            self.room_masks[classroom_id] &= keep
+        if teacher_id in self.teacher_masks:
+            self.teacher_masks[teacher_id] &= keep
+        if self.room_positions is not None and classroom_id in self.room_positions:
+            room_bit = ~(1 << self.room_positions[classroom_id])
+            for s in range(slot, slot + length):
+                if s in self.slot_room_masks:
+                    self.slot_room_masks[s] &= room_bit
@@ -0,0 +1,48 @@
+"""
+列表接口的游标分页
+
+按主键做 keyset 分页（WHERE id > 游标 ORDER BY id LIMIT n），翻到任何一页都只扫描一页的数据；
+只读查询直接用 Core 取出需要的列，不构造 ORM 对象，也不再逐行经过 Pydantic 校验。
+响应体仍然是记录数组，下一页的游标放在响应头 X-Next-Cursor 中，没有下一页时不返回该响应头。
+"""
+from typing import Iterable, List, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.schemas import ListParams
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def select_fields(fields: Optional[str], allowed: Iterable[str]) -> List[str]:
+    """解析 fields 参数，返回要查询的字段（始终包含 id）；有不允许的字段时返回 400"""
+    allowed = list(allowed)
+    requested = [name.strip() for name in (fields or "").split(",") if name.strip()] or allowed
+    unknown = [name for name in requested if name not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"未知字段: {', '.join(unknown)}")
+    return list(dict.fromkeys(["id"] + requested))
+
+
+def list_page(db: Session, model, allowed: Iterable[str], params: ListParams) -> JSONResponse:
+    """
+    查询一页记录并返回 JSON 响应
+    allowed: 接口允许返回的字段，一般为响应模型的字段
+    """
+    names = select_fields(params.fields, allowed)
+    query = select(*(getattr(model, name) for name in names)).order_by(model.id)
+    if params.after is not None:
+        query = query.where(model.id > params.after)
+    if params.limit is not None:
+        # 多取一条用来判断是否还有下一页
+        query = query.limit(params.limit + 1)
+
+    rows = db.execute(query).all()
+    headers = {}
+    if params.limit is not None and len(rows) > params.limit:
+        rows = rows[:params.limit]
+        headers[NEXT_CURSOR_HEADER] = str(rows[-1].id)
+    return JSONResponse([dict(zip(names, row)) for row in rows], headers=headers)
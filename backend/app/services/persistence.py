@@ -0,0 +1,63 @@
+"""
+课表批量写入
+
+自动排课的结果通过 SQLAlchemy Core 分批 executemany 写入，不经过 ORM 的 unit of work；
+替换课表时删除旧记录和写入新记录在同一个事务中完成，
+提交之前其他连接读到的始终是完整的旧课表，提交之后是完整的新课表。
+"""
+import os
+from typing import Dict, Iterable, List
+
+from sqlalchemy import delete, insert
+from sqlalchemy.orm import Session
+
+from app.models.models import Schedule
+from app.services import classroom_stats, schedule_changes
+
+# 每批写入的行数
+INSERT_CHUNK_SIZE = int(os.getenv("SCHEDULE_INSERT_CHUNK_SIZE", "5000"))
+
+_COLUMNS = ('course_id', 'teacher_id', 'classroom_id', 'day', 'period')
+
+
+def insert_schedules(db: Session, items: Iterable[Dict], chunk_size: int = INSERT_CHUNK_SIZE) -> int:
+    """分批插入排课记录（只取排课表中存在的字段），返回插入的行数；不提交事务"""
+    table = Schedule.__table__
+    count = 0
+    chunk: List[Dict] = []
+    for item in items:
+        chunk.append({column: item[column] for column in _COLUMNS})
+        if len(chunk) >= chunk_size:
+            db.execute(insert(table), chunk)
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        db.execute(insert(table), chunk)
+        count += len(chunk)
+    return count
+
+
+def replace_schedule(db: Session, items: Iterable[Dict], chunk_size: int = INSERT_CHUNK_SIZE,
+                     commit: bool = True) -> int:
+    """
+    用 items 替换当前课表：删除全部旧记录后分批插入新记录，两步在同一个事务中，
+    任何一步失败都会回滚，课表保持原样；教室统计表在同一个事务中按新课表重写；返回插入的行数
+    """
+    classroom_ids: List[int] = []
+
+    def collect(items):
+        for item in items:
+            classroom_ids.append(item['classroom_id'])
+            yield item
+
+    try:
+        db.execute(delete(Schedule.__table__))
+        count = insert_schedules(db, collect(items), chunk_size)
+        classroom_stats.replace_counts(db, classroom_ids)
+        schedule_changes.record(db, replaced=True)
+        if commit:
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return count
@@ -0,0 +1,171 @@
+"""
+排课问题模型
+
+把课程、教师、教室编译成只读的元组记录，并按ID建立整数下标索引。
+模型在进程内缓存，由增删改接口负责局部更新或整体失效，
+排课求解和冲突检测直接使用缓存的模型，不再查询数据库或构造 ORM 对象。
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+from typing import List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.models import Course, Teacher, Classroom
+from app.services.rooms import RoomIndex
+
+# 排课问题中用到的只读记录，字段名与对应的 ORM 模型一致
+CourseData = namedtuple('CourseData', ['id', 'name', 'hours'])
+TeacherData = namedtuple('TeacherData', ['id', 'name', 'department'])
+ClassroomData = namedtuple('ClassroomData', ['id', 'name', 'capacity', 'building'])
+
+# 各实体对应的 ORM 模型和记录类型
+_ENTITIES = {
+    'courses': (Course, CourseData),
+    'teachers': (Teacher, TeacherData),
+    'classrooms': (Classroom, ClassroomData),
+}
+
+
+class ProblemSnapshot:
+    """
+    排课问题快照
+    只包含纯数据的元组，可以被 pickle 后发送到其他进程，求解过程中不再访问数据库；
+    course_index / teacher_index / classroom_index 为 ID 到元组下标的映射
+    """
+    __slots__ = ('courses', 'teachers', 'classrooms',
+                 'course_index', 'teacher_index', 'classroom_index', '_room_index')
+
+    def __init__(self, courses: Tuple[CourseData, ...], teachers: Tuple[TeacherData, ...],
+                 classrooms: Tuple[ClassroomData, ...]):
+        self.courses = courses
+        self.teachers = teachers
+        self.classrooms = classrooms
+        self.course_index = {c.id: i for i, c in enumerate(courses)}
+        self.teacher_index = {t.id: i for i, t in enumerate(teachers)}
+        self.classroom_index = {c.id: i for i, c in enumerate(classrooms)}
+        self._room_index = None
+
+    def __getstate__(self):
+        return self.courses, self.teachers, self.classrooms
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    @property
+    def room_index(self) -> RoomIndex:
+        """按容量排序的教室索引，首次使用时构建"""
+        if self._room_index is None:
+            self._room_index = RoomIndex(self.classrooms)
+        return self._room_index
+
+    def course(self, course_id: int) -> Optional[CourseData]:
+        i = self.course_index.get(course_id)
+        return None if i is None else self.courses[i]
+
+    def teacher(self, teacher_id: int) -> Optional[TeacherData]:
+        i = self.teacher_index.get(teacher_id)
+        return None if i is None else self.teachers[i]
+
+    def classroom(self, classroom_id: int) -> Optional[ClassroomData]:
+        i = self.classroom_index.get(classroom_id)
+        return None if i is None else self.classrooms[i]
+
+    @classmethod
+    def from_db(cls, db: Session) -> 'ProblemSnapshot':
+        """从数据库读取课程、教师和教室，按ID排序保证结果可复现"""
+        records = {}
+        for entity, (model, record) in _ENTITIES.items():
+            columns = [getattr(model, field) for field in record._fields]
+            rows = db.query(*columns).order_by(model.id).all()
+            records[entity] = tuple(record(*row) for row in rows)
+        return cls(records['courses'], records['teachers'], records['classrooms'])
+
+    def replace(self, entity: str, record_id: int, record=None) -> 'ProblemSnapshot':
+        """返回替换（record 为 None 时删除）一条记录后的新快照，原快照保持不变"""
+        records = {
+            'courses': self.courses,
+            'teachers': self.teachers,
+            'classrooms': self.classrooms,
+        }
+        items = [item for item in records[entity] if item.id != record_id]
+        if record is not None:
+            items.append(record)
+            items.sort(key=lambda item: item.id)
+        records[entity] = tuple(items)
+        return ProblemSnapshot(records['courses'], records['teachers'], records['classrooms'])
+
+
+class ProblemCache:
+    """
+    进程内的排课问题模型缓存
+    本进程的写操作会立即更新缓存；多进程部署时其他进程的写操作无法通知到这里，
+    因此缓存超过 max_age 秒后会重新加载。
+    从数据库加载期间到达的修改先记下来，加载完成后在新模型上重放，不会被加载结果覆盖
+    """
+
+    def __init__(self, max_age: float = 300):
+        self.max_age = max_age
+        self._snapshot: Optional[ProblemSnapshot] = None
+        self._loaded_at = 0.0
+        self._loading = 0
+        # 加载期间到达的修改：(entity, record_id, record)，None 表示整体失效
+        self._pending: List[Optional[Tuple]] = []
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> ProblemSnapshot:
+        """获取当前的问题模型，没有缓存或缓存过期时从数据库加载"""
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and time.monotonic() - self._loaded_at < self.max_age:
+                return snapshot
+            self._loading += 1
+        try:
+            snapshot = ProblemSnapshot.from_db(db)
+        except Exception:
+            with self._lock:
+                self._loading -= 1
+            raise
+        with self._lock:
+            self._loading -= 1
+            invalidated = False
+            for patch in self._pending:
+                if patch is None:
+                    invalidated = True
+                else:
+                    snapshot = snapshot.replace(*patch)
+            if not self._loading:
+                self._pending = []
+            # 加载期间缓存被整体失效（例如批量导入）时，本次结果只用一次，不写入缓存
+            if not invalidated:
+                self._snapshot = snapshot
+                self._loaded_at = time.monotonic()
+        return snapshot
+
+    def invalidate(self):
+        """丢弃缓存，下次使用时重新加载（用于批量导入等大范围修改）"""
+        with self._lock:
+            self._snapshot = None
+            if self._loading:
+                self._pending.append(None)
+
+    def upsert(self, entity: str, obj):
+        """新增或修改一条记录后调用，obj 为已提交的 ORM 对象"""
+        record = _ENTITIES[entity][1]
+        self._patch(entity, obj.id, record(*(getattr(obj, field) for field in record._fields)))
+
+    def remove(self, entity: str, record_id: int):
+        """删除一条记录后调用"""
+        self._patch(entity, record_id, None)
+
+    def _patch(self, entity: str, record_id: int, record):
+        with self._lock:
+            if self._loading:
+                self._pending.append((entity, record_id, record))
+            if self._snapshot is not None:
+                self._snapshot = self._snapshot.replace(entity, record_id, record)
+
+
+problem_cache = ProblemCache(max_age=float(os.getenv("PROBLEM_CACHE_MAX_AGE", "300")))
@@ -0,0 +1,230 @@
+"""
+增量修复排课
+
+当某个教室被删除或某位教师不可用时，只把受影响的排课（以及与它们冲突的排课）取下来，
+其余排课保持不动，再为取下的排课重新寻找位置。
+重新安排时优先保持原时间槽，其次保持原教室，尽量少改动课表；连排课（同一课程、教师、教室
+在同一天的连续节次）作为一个整体重新安排，不会被拆到不同的教室或时间。
+新教室优先选容量不小于原教室的，找不到时放宽到排课引擎的最低容量要求 MIN_CLASSROOM_CAPACITY。
+周课表网格之外的排课（周末、第9节以后）不参与占用计算，除非所在教室被删除或教师完全不可用，
+否则保持不动；需要重新安排时放到网格内。
+"""
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.models import Schedule
+from app.services import classroom_stats, schedule_changes
+from app.services.conflicts import find_conflict_groups
+from app.services.occupancy import OccupancyIndex, in_grid, slot_index, slot_to_day_period
+from app.services.problem import problem_cache
+from app.services.rooms import MIN_CLASSROOM_CAPACITY, RoomIndex
+from app.services.sessions import split_sessions
+
+
+def repair_schedule(db: Session, classroom_id: Optional[int] = None, teacher_id: Optional[int] = None,
+                    unavailable_slots: Optional[Sequence[Tuple[int, int]]] = None,
+                    commit: bool = True) -> Dict:
+    """
+    修复课表
+    classroom_id: 被删除（不再可用）的教室
+    teacher_id: 不可用的教师；unavailable_slots 为其不可用的 (day, period) 列表，
+                不指定时表示该教师完全不可用，其课程改由其他教师承担
+    返回 {'moved': [...], 'unplaced': [...], 'unchanged': 数量}；无法重新安排的排课会被删除
+    """
+    rows = db.query(
+        Schedule.id, Schedule.course_id, Schedule.teacher_id,
+        Schedule.classroom_id, Schedule.day, Schedule.period
+    ).all()
+    problem = problem_cache.get(db)
+    # 被删除的教室不再作为候选
+    if classroom_id is None:
+        room_index = problem.room_index
+    else:
+        room_index = RoomIndex([c for c in problem.classrooms if c.id != classroom_id])
+
+    blocked_slots = {slot_index(day, period) for day, period in unavailable_slots or () if in_grid(day, period)}
+    teacher_gone = teacher_id is not None and not unavailable_slots
+    on_grid = [in_grid(row.day, row.period) for row in rows]
+
+    def is_affected(i: int) -> bool:
+        row = rows[i]
+        if classroom_id is not None and row.classroom_id == classroom_id:
+            return True
+        if teacher_id is not None and row.teacher_id == teacher_id:
+            return teacher_gone or (on_grid[i] and slot_index(row.day, row.period) in blocked_slots)
+        return False
+
+    affected = {i for i in range(len(rows)) if is_affected(i)}
+
+    # 冲突邻域：与受影响排课处于同一冲突组的其他排课也一起重新安排（只看网格内的排课）
+    grid_rows = [i for i in range(len(rows)) if on_grid[i]]
+    if affected and grid_rows:
+        groups = find_conflict_groups(
+            [rows[i].day for i in grid_rows], [rows[i].period for i in grid_rows],
+            [rows[i].classroom_id for i in grid_rows], [rows[i].teacher_id for i in grid_rows]
+        )
+        for group in groups['classroom'] + groups['teacher']:
+            members = {grid_rows[j] for j in group.tolist()}
+            if members & affected:
+                affected |= members
+
+    # 连排课整体重新安排：其中任何一节受影响时整块一起取下
+    blocks = _blocks(rows, on_grid)
+    affected_blocks = sorted({b for b, block in enumerate(blocks) if affected.intersection(block)},
+                             key=lambda b: (rows[blocks[b][0]].day, rows[blocks[b][0]].period, rows[blocks[b][0]].id))
+    affected = {i for b in affected_blocks for i in blocks[b]}
+
+    # 其余排课保持不动
+    occupancy = room_index.new_occupancy()
+    for i in grid_rows:
+        if i not in affected:
+            row = rows[i]
+            occupancy.occupy(row.teacher_id, row.classroom_id, slot_index(row.day, row.period))
+    if teacher_id is not None:
+        for slot in blocked_slots:
+            occupancy.block_teacher(teacher_id, slot)
+
+    department = {teacher.id: teacher.department for teacher in problem.teachers}
+
+    moved = []
+    unplaced = []
+    # 按原来的位置顺序处理，结果可复现
+    for b in affected_blocks:
+        block = blocks[b]
+        first = rows[block[0]]
+        current = problem.classroom(first.classroom_id)
+        current_capacity = current.capacity if current else 0
+        current_room = first.classroom_id if first.classroom_id in room_index.positions else None
+        candidate_teachers = _candidate_teachers(first.teacher_id, teacher_id, teacher_gone, department)
+        slot = slot_index(first.day, first.period) if on_grid[block[0]] else None
+        # 优先容量不小于原教室的教室，找不到时放宽到排课引擎的最低容量要求
+        tiers = sorted({current_capacity, min(current_capacity, MIN_CLASSROOM_CAPACITY)}, reverse=True)
+        placement = None
+        for needed in tiers:
+            placement = _place(occupancy, room_index, slot, len(block), candidate_teachers, current_room, needed)
+            if placement is not None:
+                break
+        if placement is None:
+            if current_room is None and not room_index.fitting(tiers[-1]):
+                message = '没有容量足够的教室，已从课表中移除'
+            else:
+                message = '无法找到合适的时间槽，已从课表中移除'
+            unplaced.extend((rows[i], message) for i in block)
+            continue
+        new_teacher_id, new_classroom_id, start = placement
+        occupancy.occupy(new_teacher_id, new_classroom_id, start, len(block))
+        for offset, i in enumerate(block):
+            row = rows[i]
+            day, period = slot_to_day_period(start + offset)
+            if (new_teacher_id, new_classroom_id, day, period) != (row.teacher_id, row.classroom_id, row.day, row.period):
+                moved.append({
+                    'id': row.id,
+                    'course_id': row.course_id,
+                    'teacher_id': new_teacher_id,
+                    'classroom_id': new_classroom_id,
+                    'day': day,
+                    'period': period,
+                })
+
+    if unplaced:
+        db.query(Schedule).filter(
+            Schedule.id.in_([row.id for row, _ in unplaced])
+        ).delete(synchronize_session=False)
+    if moved:
+        # 逐行更新时新位置可能还被另一条尚未更新的排课占着，会触发时间槽唯一约束，
+        # 所以先把要移动的排课挪到不存在的节次（-id），再更新到新位置
+        db.bulk_update_mappings(Schedule, [{'id': item['id'], 'period': -item['id']} for item in moved])
+        db.bulk_update_mappings(Schedule, moved)
+
+    # 教室统计表增量更新：移走的、删除的排课从原教室减去，移入的加到新教室
+    old_rooms = {row.id: row.classroom_id for row in rows}
+    deltas = Counter()
+    for row, _ in unplaced:
+        deltas[row.classroom_id] -= 1
+    for item in moved:
+        deltas[old_rooms[item['id']]] -= 1
+        deltas[item['classroom_id']] += 1
+    classroom_stats.apply_deltas(db, deltas)
+    schedule_changes.record(db, upserted=moved, deleted=[row.id for row, _ in unplaced])
+    if commit:
+        db.commit()
+
+    return {
+        'moved': moved,
+        'unplaced': [
+            {
+                'id': row.id,
+                'course_id': row.course_id,
+                'teacher_id': row.teacher_id,
+                'classroom_id': row.classroom_id,
+                'day': row.day,
+                'period': row.period,
+                'message': message
+            }
+            for row, message in unplaced
+        ],
+        'unchanged': len(rows) - len(moved) - len(unplaced),
+    }
+
+
+def _candidate_teachers(current_id: int, unavailable_id: Optional[int], teacher_gone: bool,
+                        department: Dict[int, str]) -> List[int]:
+    """候选教师：原教师可用时只用原教师，否则优先同院系的其他教师"""
+    if not (teacher_gone and current_id == unavailable_id):
+        return [current_id]
+    others = [tid for tid in department if tid != unavailable_id]
+    same_department = department.get(current_id)
+    return sorted(others, key=lambda tid: (department[tid] != same_department, tid))
+
+
+def _place(occupancy: OccupancyIndex, room_index: RoomIndex, slot: Optional[int], length: int,
+           teachers: List[int], current_room: Optional[int], needed: int) -> Optional[Tuple[int, int, int]]:
+    """
+    为连续 length 节的一块排课寻找新位置，返回 (教师, 教室, 起始时间槽)：
+    先尝试保持原时间槽（优先原教室，其次容量足够的最小空闲教室），
+    再按 原教室、容量从小到大的其他教室 的顺序找第一段连续空闲的时间槽；
+    slot 为 None（原位置在网格之外）时直接寻找空闲时间槽
+    """
+    if slot is not None:
+        for teacher in teachers:
+            if current_room is not None and occupancy.free_block_starts(teacher, current_room, length) >> slot & 1:
+                return teacher, current_room, slot
+            room = room_index.smallest_free(needed, slot, occupancy, teacher, length=length)
+            if room is not None:
+                return teacher, room.id, slot
+
+    rooms = [current_room] if current_room is not None else []
+    rooms.extend(room.id for room in room_index.fitting(needed) if room.id != current_room)
+    for teacher in teachers:
+        for room in rooms:
+            start = occupancy.find_first_free_block(teacher, room, length)
+            if start is not None:
+                return teacher, room, start
+    return None
+
+
+def _blocks(rows: Sequence, on_grid: List[bool]) -> List[List[int]]:
+    """
+    把排课分成需要整体安排的块（行下标列表，按节次排列）：同一课程、教师、教室在同一天的连续节次
+    为一块，过长的连续段按 split_sessions 切分；网格之外的排课各自单独一块
+    """
+    blocks = [[i] for i in range(len(rows)) if not on_grid[i]]
+    order = sorted((i for i in range(len(rows)) if on_grid[i]),
+                   key=lambda i: (rows[i].course_id, rows[i].teacher_id, rows[i].classroom_id,
+                                  rows[i].day, rows[i].period))
+    run: List[int] = []
+    for i in order + [None]:
+        if i is not None and run:
+            last, row = rows[run[-1]], rows[i]
+            if (row.course_id, row.teacher_id, row.classroom_id, row.day, row.period) == \
+                    (last.course_id, last.teacher_id, last.classroom_id, last.day, last.period + 1):
+                run.append(i)
+                continue
+        start = 0
+        for length in split_sessions(len(run)):
+            blocks.append(run[start:start + length])
+            start += length
+        run = [i] if i is not None else []
+    return blocks
@@ -0,0 +1,238 @@
+"""
+GET 接口的响应缓存
+
+每类数据（教师、课程、教室、课表）有一个版本号，保存在数据库的 cache_versions 表中，
+所有工作进程共享；写接口执行后把相关数据的版本号加一。
+GET 响应按 路径+查询参数 缓存序列化后的响应体，连同生成时依赖数据的版本号一起放在进程内的 LRU 中。
+每个 GET 请求先读一次版本号（一条只有几行的查询），没变时直接返回缓存的响应体，
+不执行列表查询也不做 JSON 序列化；任何进程的写操作都会让所有进程的缓存失效。
+请求带 If-None-Match 且与 ETag（响应体的哈希）一致时返回 304。
+读取或更新版本号失败时不使用缓存（更新失败时清空本进程的缓存，其他进程的缓存最多保留 max_age 秒）。
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Request
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.datastructures import Headers
+from starlette.responses import Response
+
+from app.config import async_engine, engine
+from app.models.models import CacheVersion
+
+ENTITIES = ('teachers', 'courses', 'classrooms', 'schedules')
+
+# (路径前缀, GET 响应依赖的数据, 写请求会修改的数据)，按顺序匹配第一个前缀；
+# 依赖为 None 的路径不缓存（任务状态会在没有写请求的情况下变化）；
+# 后台排课任务在写入课表之后自己更新版本号（见 app/routes/jobs.py）
+ROUTES: List[Tuple[str, Optional[Tuple[str, ...]], Tuple[str, ...]]] = [
+    ('/api/schedule/jobs', None, ()),
+    # 冲突检查是 POST，但不修改数据
+    ('/api/schedule/check', None, ()),
+    ('/api/schedule/changes', None, ()),
+    ('/api/classrooms/stats', ('classrooms', 'schedules'), ()),
+    ('/api/schedules', ('schedules',), ('schedules',)),
+    ('/api/schedule', ENTITIES, ('schedules',)),
+    # 删除教师、教室会修复课表
+    ('/api/teachers', ('teachers',), ('teachers', 'schedules')),
+    ('/api/courses', ('courses',), ('courses',)),
+    ('/api/classrooms', ('classrooms',), ('classrooms', 'schedules')),
+]
+
+_SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+# 流式返回的文件下载，不经过缓存
+_STREAMING_SUFFIXES = ('/export',)
+
+
+def _match(path: str):
+    for prefix, reads, writes in ROUTES:
+        if path == prefix or path.startswith(prefix + '/'):
+            return reads, writes
+    return None
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 使用弱比较：忽略 W/ 前缀，支持多个值和 *"""
+    if not if_none_match:
+        return False
+    for value in if_none_match.split(','):
+        value = value.strip()
+        if value == '*' or value.replace('W/', '', 1) == etag:
+            return True
+    return False
+
+
+def _bump_versions(conn, entities):
+    """版本号加一；表中还没有这类数据的行时（例如直接 create_all 建表）插入一行"""
+    result = conn.execute(
+        update(CacheVersion).where(CacheVersion.entity.in_(entities)).values(version=CacheVersion.version + 1)
+    )
+    if result.rowcount < len(set(entities)):
+        existing = set(conn.execute(select(CacheVersion.entity).where(CacheVersion.entity.in_(entities))).scalars())
+        conn.execute(insert(CacheVersion), [
+            {'entity': entity, 'version': 1} for entity in sorted(set(entities) - existing)
+        ])
+
+
+class CachedResponse:
+    __slots__ = ('versions', 'body', 'etag', 'headers', 'media_type', 'created_at')
+
+    def __init__(self, versions: Tuple[int, ...], body: bytes, headers: Dict[str, str], media_type: str):
+        self.versions = versions
+        self.body = body
+        self.etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        self.headers = headers
+        self.media_type = media_type
+        self.created_at = time.monotonic()
+
+
+class ResponseCache:
+    """按数据版本号失效的 GET 响应 LRU 缓存"""
+
+    def __init__(self, max_entries: int = 256, max_age: float = 300):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries: 'OrderedDict[str, CachedResponse]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def versions(self, entities) -> Optional[Tuple[int, ...]]:
+        """从数据库读取数据的当前版本号，读取失败时返回 None（本次请求不使用缓存）"""
+        try:
+            async with async_engine.connect() as conn:
+                rows = dict((await conn.execute(select(CacheVersion.entity, CacheVersion.version))).all())
+        except SQLAlchemyError:
+            return None
+        return tuple(rows.get(entity, 0) for entity in entities)
+
+    def bump(self, *entities: str):
+        """数据被修改后调用（同步版本，供工作线程使用），所有进程中依赖这些数据的缓存响应随之失效"""
+        if not entities:
+            return
+        try:
+            with engine.begin() as conn:
+                _bump_versions(conn, entities)
+        except SQLAlchemyError:
+            self.clear()
+
+    async def bump_async(self, *entities: str):
+        """数据被修改后调用（异步版本，供中间件使用）"""
+        if not entities:
+            return
+        try:
+            async with async_engine.begin() as conn:
+                await conn.run_sync(_bump_versions, entities)
+        except SQLAlchemyError:
+            self.clear()
+
+    def get(self, key: str, versions: Tuple[int, ...]) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.versions != versions or time.monotonic() - entry.created_at >= self.max_age:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: CachedResponse):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def respond(request: Request, entry: CachedResponse) -> Response:
+        headers = {**entry.headers, 'ETag': entry.etag, 'Cache-Control': 'no-cache'}
+        if _etag_matches(request.headers.get('if-none-match'), entry.etag):
+            return Response(status_code=304, headers={'ETag': entry.etag, 'Cache-Control': 'no-cache'})
+        return Response(content=entry.body, headers=headers, media_type=entry.media_type)
+
+class ResponseCacheMiddleware:
+    """
+    ASGI 中间件：GET 请求走缓存，写请求执行后更新版本号
+    不缓存的请求（写请求、导出文件、变更推送等）直接交给应用，响应体逐块转发，保留流式响应的背压；
+    只有将要缓存的 200 JSON 响应才会被收集完整的响应体
+    """
+
+    def __init__(self, app, cache: ResponseCache):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        path = scope['path']
+        route = _match(path)
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+        reads, writes = route
+
+        method = scope['method']
+        if method not in _SAFE_METHODS:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                await self.cache.bump_async(*writes)
+            return
+        if method != 'GET' or reads is None or path.endswith(_STREAMING_SUFFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        query = scope.get('query_string', b'').decode('latin-1')
+        key = path + '?' + query
+        # 版本号在执行接口之前读取，执行期间发生的写操作会让这次生成的缓存下次直接失效
+        versions = await self.cache.versions(reads)
+        if versions is None:
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        entry = self.cache.get(key, versions)
+        if entry is not None:
+            await self.cache.respond(request, entry)(scope, receive, send)
+            return
+
+        start = None
+        chunks = []
+
+        async def capture(message):
+            nonlocal start
+            if message['type'] == 'http.response.start':
+                headers = Headers(raw=message['headers'])
+                # 只缓存成功的 JSON 响应，其他响应原样转发
+                if message['status'] == 200 and headers.get('content-type', '').startswith('application/json'):
+                    start = message
+                    return
+            elif message['type'] == 'http.response.body' and start is not None:
+                chunks.append(message.get('body', b''))
+                return
+            await send(message)
+
+        await self.app(scope, receive, capture)
+        if start is None:
+            return
+        headers = Headers(raw=start['headers'])
+        entry = CachedResponse(versions, b''.join(chunks), {
+            name: value for name, value in headers.items()
+            if name not in ('content-length', 'content-type', 'etag')
+        }, headers['content-type'])
+        self.cache.put(key, entry)
+        await self.cache.respond(request, entry)(scope, receive, send)
+
+
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "256")),
+    max_age=float(os.getenv("RESPONSE_CACHE_MAX_AGE", "300")),
+)
@@ -0,0 +1,71 @@
+"""
+教室容量索引
+
+教室按容量从小到大排序，查找"容量不小于 N 的教室"只需二分查找加切片；
+每个教室在排序中的位置同时作为位图中的一位，结合时间槽占用位图，
+可以直接求出"某时间槽空闲且容量足够的最小教室"。
+"""
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.services.occupancy import OccupancyIndex
+
+# 课程暂无选课人数字段，排课时所有课程统一要求的最小教室容量
+MIN_CLASSROOM_CAPACITY = 50
+
+
+class RoomIndex:
+    """按容量排序的教室索引，可按教学楼分区；classrooms 的元素需要有 id、capacity、building 属性"""
+
+    def __init__(self, classrooms: Sequence[Any]):
+        self.rooms: List[Any] = sorted(classrooms, key=lambda c: (c.capacity, c.id))
+        self.capacities = [c.capacity for c in self.rooms]
+        # 教室ID -> 在容量排序中的位置
+        self.positions: Dict[int, int] = {c.id: i for i, c in enumerate(self.rooms)}
+
+        self.buildings: Dict[str, List[Any]] = {}
+        self.building_masks: Dict[str, int] = {}
+        for i, room in enumerate(self.rooms):
+            self.buildings.setdefault(room.building, []).append(room)
+            self.building_masks[room.building] = self.building_masks.get(room.building, 0) | (1 << i)
+        self.building_capacities = {
+            building: [c.capacity for c in rooms] for building, rooms in self.buildings.items()
+        }
+
+    def fitting(self, min_capacity: int, building: Optional[str] = None) -> List[Any]:
+        """容量不小于 min_capacity 的教室，按容量从小到大排列"""
+        if building is None:
+            return self.rooms[bisect_left(self.capacities, min_capacity):]
+        rooms = self.buildings.get(building, [])
+        return rooms[bisect_left(self.building_capacities.get(building, []), min_capacity):]
+
+    def fitting_mask(self, min_capacity: int, building: Optional[str] = None) -> int:
+        """容量不小于 min_capacity 的教室对应的位置位图"""
+        start = bisect_left(self.capacities, min_capacity)
+        mask = ((1 << len(self.rooms)) - 1) >> start << start
+        if building is not None:
+            mask &= self.building_masks.get(building, 0)
+        return mask
+
+    def new_occupancy(self) -> OccupancyIndex:
+        """创建一个同时按时间槽记录已占用教室位置的占用索引，用于 smallest_free 查询"""
+        return OccupancyIndex(room_positions=self.positions)
+
+    def smallest_free(self, min_capacity: int, slot: int, occupancy: OccupancyIndex,
+                      teacher_id: Optional[int] = None,
+                      building: Optional[str] = None, length: int = 1) -> Optional[Any]:
+        """
+        时间槽 slot 空闲（length 大于1时从 slot 开始连续 length 个时间槽都空闲）、
+        容量不小于 min_capacity 的最小教室；指定 teacher_id 时教师在这些时间槽也必须空闲
+        occupancy 需要由 new_occupancy() 创建
+        """
+        slots = range(slot, slot + length)
+        if teacher_id is not None and any(occupancy.teacher_masks.get(teacher_id, 0) >> s & 1 for s in slots):
+            return None
+        busy = 0
+        for s in slots:
+            busy |= occupancy.slot_room_masks.get(s, 0)
+        free = self.fitting_mask(min_capacity, building) & ~busy
+        if not free:
+            return None
+        return self.rooms[(free & -free).bit_length() - 1]
@@ -0,0 +1,226 @@
+"""
+课表修改通知
+
+修改课表的代码在事务中调用 record() 登记改动（新增/修改的排课、删除的排课ID、整张课表被替换），
+改动暂存在会话的 info 里，事务提交之后才通知订阅者，回滚时直接丢弃，
+订阅者（时间表网格缓存等）看到的始终是已经提交的数据。
+通知在执行提交的线程中同步调用，订阅者需要自己保证线程安全。
+ScheduleMirror 是在内存中维护一份课表并随通知增量更新的订阅者基类。
+"""
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.models.models import Schedule
+
+ScheduleRow = namedtuple('ScheduleRow', ['id', 'course_id', 'teacher_id', 'classroom_id', 'day', 'period'])
+
+_INFO_KEY = 'schedule_changes'
+
+
+class ScheduleChanges:
+    """
+    一个事务对课表的改动；replaced 为 True 时整张课表被替换，upserted / deleted 为空
+    inserted 为 upserted 中本事务新增的排课ID，其余为修改
+    """
+    __slots__ = ('upserted', 'inserted', 'deleted', 'replaced', 'objects')
+
+    def __init__(self):
+        self.upserted: Dict[int, ScheduleRow] = {}
+        self.inserted: Set[int] = set()
+        self.deleted: Set[int] = set()
+        self.replaced = False
+        # 尚未 flush 的 (ORM 对象, 是否新增)，flush 之后（有了ID）再转换成 ScheduleRow
+        self.objects: List = []
+
+    def __bool__(self):
+        return bool(self.upserted or self.deleted or self.replaced or self.objects)
+
+
+_subscribers: List[Callable[[ScheduleChanges], None]] = []
+
+
+def subscribe(callback: Callable[[ScheduleChanges], None]):
+    """订阅已提交的课表改动"""
+    _subscribers.append(callback)
+
+
+def _row(item) -> ScheduleRow:
+    if isinstance(item, dict):
+        return ScheduleRow(*(item[field] for field in ScheduleRow._fields))
+    return ScheduleRow._make(item)
+
+
+def record(session, upserted: Iterable = (), deleted: Iterable[int] = (), replaced: bool = False):
+    """
+    登记本事务中对课表的改动，提交后通知订阅者
+    upserted 的元素可以是 ORM 对象（可以尚未 flush）、带完整字段的字典或行；
+    session 可以是 Session 或 AsyncSession
+    """
+    session = getattr(session, 'sync_session', session)
+    changes = session.info.get(_INFO_KEY)
+    if changes is None:
+        changes = session.info[_INFO_KEY] = ScheduleChanges()
+    if replaced:
+        changes.replaced = True
+        changes.upserted.clear()
+        changes.inserted.clear()
+        changes.deleted.clear()
+        changes.objects.clear()
+        return
+    for item in upserted:
+        if isinstance(item, (dict, tuple)):
+            row = _row(item)
+            changes.upserted[row.id] = row
+            changes.deleted.discard(row.id)
+        else:
+            state = inspect(item)
+            changes.objects.append((item, state.transient or state.pending))
+    for schedule_id in deleted:
+        changes.upserted.pop(schedule_id, None)
+        changes.inserted.discard(schedule_id)
+        changes.deleted.add(schedule_id)
+
+
+def _take(session: Session) -> Optional[ScheduleChanges]:
+    return session.info.pop(_INFO_KEY, None)
+
+
+def _resolve_objects(changes: ScheduleChanges):
+    """把登记的 ORM 对象转换成 ScheduleRow；只读取已加载的属性，不会触发查询"""
+    for obj, new in changes.objects:
+        values = inspect(obj).dict
+        if all(field in values for field in ScheduleRow._fields):
+            row = ScheduleRow(*(values[field] for field in ScheduleRow._fields))
+            changes.upserted[row.id] = row
+            changes.deleted.discard(row.id)
+            if new:
+                changes.inserted.add(row.id)
+    changes.objects = []
+
+
+@event.listens_for(Session, 'after_flush')
+def _after_flush(session, flush_context):
+    changes = session.info.get(_INFO_KEY)
+    if changes is not None and changes.objects:
+        _resolve_objects(changes)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish(session):
+    changes = _take(session)
+    if not changes:
+        return
+    # 没有实际修改的对象不会触发 flush，在这里补上转换
+    _resolve_objects(changes)
+    for callback in _subscribers:
+        callback(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard(session):
+    _take(session)
+
+
+class ScheduleMirror:
+    """
+    内存中的课表副本：首次使用时从数据库加载，之后随提交的改动增量更新，
+    整张课表被替换或超过 max_age 秒（多进程部署时其他进程的改动通知不到）后重新加载
+    子类实现 _reset / _added / _removed 维护自己的索引，访问索引时需持有 self._lock
+    """
+
+    def __init__(self, max_age: float = 300):
+        self.max_age = max_age
+        self._rows: Optional[Dict[int, ScheduleRow]] = None
+        self._loaded_at = 0.0
+        # 加载期间提交的改动，加载完成后重放（改动是幂等的，重放不会出错）
+        self._loading = 0
+        self._pending: List[ScheduleChanges] = []
+        self._lock = threading.RLock()
+        subscribe(self.on_changes)
+
+    def _reset(self):
+        """清空索引"""
+
+    def _added(self, row: ScheduleRow):
+        """一条排课加入副本之后调用"""
+
+    def _removed(self, row: ScheduleRow):
+        """一条排课从副本移除之后调用"""
+
+    @property
+    def loaded(self) -> bool:
+        return self._rows is not None and time.monotonic() - self._loaded_at < self.max_age
+
+    def ensure_loaded(self, db: Session):
+        with self._lock:
+            if self.loaded:
+                return
+            self._loading += 1
+        try:
+            rows = [ScheduleRow._make(row) for row in db.query(
+                Schedule.id, Schedule.course_id, Schedule.teacher_id,
+                Schedule.classroom_id, Schedule.day, Schedule.period
+            )]
+        except Exception:
+            with self._lock:
+                self._loading -= 1
+            raise
+        with self._lock:
+            self._loading -= 1
+            self._rows = {}
+            self._reset()
+            for row in rows:
+                self._add(row)
+            self._loaded_at = time.monotonic()
+            pending, self._pending = self._pending, []
+            for changes in pending:
+                self._apply(changes)
+
+    @contextmanager
+    def loaded_lock(self, db: Session):
+        """持有锁并保证副本已加载（加载之后、取得锁之前副本可能又被整体替换，此时重新加载）"""
+        while True:
+            self.ensure_loaded(db)
+            with self._lock:
+                if self._rows is not None:
+                    yield
+                    return
+
+    def invalidate(self):
+        with self._lock:
+            self._rows = None
+            self._reset()
+
+    def on_changes(self, changes: ScheduleChanges):
+        """课表修改提交后调用"""
+        with self._lock:
+            if self._loading:
+                self._pending.append(changes)
+            if self._rows is not None:
+                self._apply(changes)
+
+    def _apply(self, changes: ScheduleChanges):
+        if changes.replaced:
+            self._rows = None
+            self._reset()
+            return
+        for schedule_id in changes.deleted:
+            self._discard(schedule_id)
+        for row in changes.upserted.values():
+            self._discard(row.id)
+            self._add(row)
+
+    def _add(self, row: ScheduleRow):
+        self._rows[row.id] = row
+        self._added(row)
+
+    def _discard(self, schedule_id: int):
+        row = self._rows.pop(schedule_id, None)
+        if row is not None:
+            self._removed(row)
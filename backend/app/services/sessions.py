@@ -0,0 +1,35 @@
+"""
+课时展开
+
+Course.hours 为整个学期的总学时，按教学周数折算成每周课时，
+再拆成若干次课：优先两节连排，课时为奇数时其中一次三节连排，只有1课时的课单独一节。
+"""
+import math
+from typing import List
+
+# 每学期的教学周数
+TEACHING_WEEKS = 16
+
+def weekly_periods(hours: int) -> int:
+    """学期总学时折算成每周课时，至少1节"""
+    return max(1, math.ceil((hours or 0) / TEACHING_WEEKS))
+
+
+def split_sessions(periods: int) -> List[int]:
+    """
+    把每周课时拆成若干次课，返回每次课的连排节数（从长到短）
+    例如 1 -> [1]，4 -> [2, 2]，5 -> [3, 2]，7 -> [3, 2, 2]
+    """
+    if periods <= 1:
+        return [1] * periods
+    sessions = []
+    if periods % 2:
+        sessions.append(3)
+        periods -= 3
+    sessions.extend([2] * (periods // 2))
+    return sessions
+
+
+def course_sessions(hours: int) -> List[int]:
+    """课程每周各次课的连排节数"""
+    return split_sessions(weekly_periods(hours))
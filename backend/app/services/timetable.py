@@ -0,0 +1,119 @@
+"""
+时间表网格
+
+按教师、教室、教学楼生成 周几 × 节次 的二维网格，前端不再需要拉取整张课表自己转换。
+课表行常驻内存（ScheduleMirror）并按教师、教室建立索引，渲染好的网格按实体缓存；
+课表修改提交后只让受影响的教师、教室、教学楼的网格失效。
+名称等基础数据来自 problem_cache，快照变化时网格全部重新渲染。
+"""
+import os
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.services.occupancy import DAYS_PER_WEEK, PERIODS_PER_DAY
+from app.services.problem import ProblemSnapshot, problem_cache
+from app.services.schedule_changes import ScheduleMirror, ScheduleRow
+
+TEACHER = 'teacher'
+CLASSROOM = 'classroom'
+BUILDING = 'building'
+
+
+class TimetableCache(ScheduleMirror):
+    """课表行、按教师/教室的索引和渲染好的网格"""
+
+    def __init__(self, max_age: float = 300):
+        self._by_teacher: Dict[int, Set[int]] = {}
+        self._by_classroom: Dict[int, Set[int]] = {}
+        self._days = DAYS_PER_WEEK
+        self._periods = PERIODS_PER_DAY
+        self._snapshot: Optional[ProblemSnapshot] = None
+        self._grids: Dict[Tuple[str, Any], list] = {}
+        super().__init__(max_age)
+
+    def _reset(self):
+        self._by_teacher = {}
+        self._by_classroom = {}
+        self._days, self._periods = DAYS_PER_WEEK, PERIODS_PER_DAY
+        self._grids = {}
+
+    def _added(self, row: ScheduleRow):
+        self._by_teacher.setdefault(row.teacher_id, set()).add(row.id)
+        self._by_classroom.setdefault(row.classroom_id, set()).add(row.id)
+        if row.day > self._days or row.period > self._periods:
+            # 网格尺寸变大，所有网格重新渲染
+            self._days, self._periods = max(self._days, row.day), max(self._periods, row.period)
+            self._grids = {}
+        self._invalidate_row(row)
+
+    def _removed(self, row: ScheduleRow):
+        self._by_teacher.get(row.teacher_id, set()).discard(row.id)
+        self._by_classroom.get(row.classroom_id, set()).discard(row.id)
+        self._invalidate_row(row)
+
+    def _invalidate_row(self, row: ScheduleRow):
+        self._grids.pop((TEACHER, row.teacher_id), None)
+        self._grids.pop((CLASSROOM, row.classroom_id), None)
+        classroom = self._snapshot.classroom(row.classroom_id) if self._snapshot is not None else None
+        if classroom is not None:
+            self._grids.pop((BUILDING, classroom.building), None)
+
+    def _cell(self, row: ScheduleRow) -> Dict[str, Any]:
+        course = self._snapshot.course(row.course_id)
+        teacher = self._snapshot.teacher(row.teacher_id)
+        classroom = self._snapshot.classroom(row.classroom_id)
+        return {
+            'id': row.id,
+            'course_id': row.course_id,
+            'course_name': course.name if course else None,
+            'teacher_id': row.teacher_id,
+            'teacher_name': teacher.name if teacher else None,
+            'classroom_id': row.classroom_id,
+            'classroom_name': classroom.name if classroom else None,
+            'building': classroom.building if classroom else None,
+        }
+
+    def _render(self, schedule_ids: Iterable[int], multiple: bool) -> list:
+        """渲染网格 grid[day - 1][period - 1]；multiple 为 True 时每格是排课列表，否则是一条排课或 None"""
+        grid = [[[] if multiple else None for _ in range(self._periods)] for _ in range(self._days)]
+        for schedule_id in sorted(schedule_ids):
+            row = self._rows[schedule_id]
+            if row.day < 1 or row.period < 1:
+                continue
+            if multiple:
+                grid[row.day - 1][row.period - 1].append(self._cell(row))
+            else:
+                grid[row.day - 1][row.period - 1] = self._cell(row)
+        return grid
+
+    def grids(self, db: Session, kind: str, keys: List[Any]) -> Dict[str, Any]:
+        """
+        一次获取多个教师 / 教室 / 教学楼的网格，keys 为教师ID、教室ID或教学楼名称
+        返回 {'days': 天数, 'periods': 每天节数, 'grids': {key: grid}}
+        """
+        snapshot = problem_cache.get(db)
+        with self.loaded_lock(db):
+            if snapshot is not self._snapshot:
+                self._snapshot = snapshot
+                self._grids = {}
+            result = {}
+            for key in keys:
+                grid = self._grids.get((kind, key))
+                if grid is None:
+                    grid = self._grids[(kind, key)] = self._render(self._schedule_ids(kind, key), kind == BUILDING)
+                result[key] = grid
+            return {'days': self._days, 'periods': self._periods, 'grids': result}
+
+    def _schedule_ids(self, kind: str, key: Any) -> Set[int]:
+        if kind == TEACHER:
+            return self._by_teacher.get(key, set())
+        if kind == CLASSROOM:
+            return self._by_classroom.get(key, set())
+        ids = set()
+        for classroom in self._snapshot.room_index.buildings.get(key, []):
+            ids |= self._by_classroom.get(classroom.id, set())
+        return ids
+
+
+timetable_cache = TimetableCache(max_age=float(os.getenv("TIMETABLE_CACHE_MAX_AGE", "300")))
@@ -0,0 +1,145 @@
+"""
+启动流程
+
+导入模块时不做任何数据库操作，工作进程可以立即开始接受请求；
+应用启动事件中在后台线程预热：检查数据库版本、建立连接池中的连接、
+加载排课问题模型和课表副本。预热进度和结果由 /api/health 报告，预热完成前返回 503，
+负载均衡可以据此决定何时把流量切到新进程。
+建库建表只在 scripts/migrate.py 中执行一次；设置 RUN_MIGRATIONS_ON_STARTUP=1 时
+（例如单进程的开发环境）在预热开始前执行迁移。
+"""
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+
+from app.config import SessionLocal, async_engine, engine
+from app.migrations import pending_migrations, run_migrations
+from app.services.live_occupancy import live_occupancy
+from app.services.problem import problem_cache
+from app.services.timetable import timetable_cache
+
+RUN_MIGRATIONS_ON_STARTUP = os.getenv("RUN_MIGRATIONS_ON_STARTUP", "0") == "1"
+STARTUP_RETRY_INTERVAL = float(os.getenv("STARTUP_RETRY_INTERVAL", "5"))
+
+STARTING = 'starting'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class StartupState:
+    """启动预热的进度，每一步记录耗时或错误"""
+
+    def __init__(self):
+        self.status = STARTING
+        self.started_at = time.time()
+        self.ready_at: Optional[float] = None
+        self.steps: Dict[str, Dict[str, Any]] = {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'status': self.status,
+            'ready': self.status == READY,
+            'uptime': round(time.time() - self.started_at, 3),
+            'startup_seconds': None if self.ready_at is None else round(self.ready_at - self.started_at, 3),
+            'steps': self.steps,
+        }
+
+
+startup_state = StartupState()
+
+
+def _check_schema() -> Dict[str, Any]:
+    pending = [module.VERSION for module in pending_migrations(engine)]
+    if pending:
+        raise RuntimeError(f"数据库有未执行的迁移 {pending}，请先运行 python -m scripts.migrate")
+    return {}
+
+
+def _warm_pool() -> Dict[str, Any]:
+    """建立连接池中的全部常驻连接，之后的请求不再等待建立连接"""
+    size = engine.pool.size() if hasattr(engine.pool, 'size') else 1
+    connections = []
+    try:
+        for _ in range(size):
+            conn = engine.connect()
+            connections.append(conn)
+            conn.execute(text("SELECT 1"))
+    finally:
+        for conn in connections:
+            conn.close()
+    return {'connections': size}
+
+
+def _warm_caches() -> Dict[str, Any]:
+    """加载排课问题模型、实时占用索引和时间表网格使用的课表副本"""
+    db = SessionLocal()
+    try:
+        problem = problem_cache.get(db)
+        live_occupancy.ensure_loaded(db)
+        timetable_cache.ensure_loaded(db)
+    finally:
+        db.close()
+    return {'courses': len(problem.courses), 'teachers': len(problem.teachers),
+            'classrooms': len(problem.classrooms)}
+
+
+async def _warm_async_pool() -> Dict[str, Any]:
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    return {}
+
+
+async def _run_step(state: StartupState, name: str, step) -> bool:
+    started = time.monotonic()
+    try:
+        if asyncio.iscoroutinefunction(step):
+            detail = await step()
+        else:
+            detail = await asyncio.get_running_loop().run_in_executor(None, step)
+    except Exception as e:
+        state.steps[name] = {'ok': False, 'error': str(e)}
+        return False
+    state.steps[name] = {'ok': True, 'seconds': round(time.monotonic() - started, 3), **detail}
+    return True
+
+
+async def warm_up(state: StartupState = startup_state):
+    """
+    按顺序执行预热步骤；某一步失败时状态为 failed（健康检查报告错误），
+    隔 STARTUP_RETRY_INTERVAL 秒从失败的那一步重试，数据库晚于应用启动时也能自动恢复
+    """
+    steps = [('schema', _check_schema), ('pool', _warm_pool), ('async_pool', _warm_async_pool),
+             ('caches', _warm_caches)]
+    if RUN_MIGRATIONS_ON_STARTUP:
+        steps.insert(0, ('migrate', lambda: {'applied': run_migrations(engine)}))
+    for name, step in steps:
+        while not await _run_step(state, name, step):
+            state.status = FAILED
+            await asyncio.sleep(STARTUP_RETRY_INTERVAL)
+        state.status = STARTING
+    state.status = READY
+    state.ready_at = time.time()
+
+
+_warm_up_task: Optional[asyncio.Task] = None
+
+
+async def start_warm_up():
+    """应用启动：在后台预热，不阻塞接受请求"""
+    global _warm_up_task
+    _warm_up_task = asyncio.create_task(warm_up())
+
+
+async def stop_warm_up():
+    """应用退出：取消尚未完成的预热并关闭连接池"""
+    if _warm_up_task is not None:
+        _warm_up_task.cancel()
+        try:
+            await _warm_up_task
+        except (asyncio.CancelledError, Exception):
+            pass
+    engine.dispose()
+    await async_engine.dispose()
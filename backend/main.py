@@ -3,15 +3,28 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, RedirectResponse
 import os
+from collections import Counter
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.routes.teachers import router as teachers_router
 from app.routes.courses import router as courses_router
 from app.routes.classrooms import router as classrooms_router
 from app.routes.schedules import router as schedules_router
-from app.config import create_tables, get_db
-from app.scheduler import Scheduler
-from app.models import Schedule
+from app.config import get_db, get_async_db
+from app.routes.health import router as health_router
+from app.startup import start_warm_up, stop_warm_up
+from app.routes.jobs import router as jobs_router
+from app.routes.schedule import router as schedule_router
+from app.scheduler import run_generation
+from app.models.schemas import ScheduleGenerateParams, ScheduleRepairRequest, ScheduleUpdateItem
+from app.services.repair import repair_schedule
+from app.services import classroom_stats, schedule_changes
+from app.services.response_cache import ResponseCacheMiddleware, response_cache
+from app.services.live_occupancy import live_occupancy
+from app.services.occupancy import in_grid
+from app.models import Schedule, Course, Teacher, Classroom
 
 app = FastAPI(
     title="高校排课系统API",
@@ -20,6 +33,13 @@ app = FastAPI(
     debug=True
 )
 
+# 启动时在后台预热，退出时关闭连接池
+app.on_event("startup")(start_warm_up)
+app.on_event("shutdown")(stop_warm_up)
+
+# GET 接口响应缓存（版本号 + ETag），注册在 CORS 之前，位于其内层
+app.add_middleware(ResponseCacheMiddleware, cache=response_cache)
+
 # 配置CORS
 app.add_middleware(
     CORSMiddleware,
@@ -27,20 +47,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # 获取项目根目录
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 FRONTEND_DIR = os.path.join(ROOT_DIR, "frontend")
 
-# 创建数据库表
-create_tables()
-
 # 注册API路由
 app.include_router(teachers_router, prefix="/api/teachers", tags=["teachers"])
 app.include_router(courses_router, prefix="/api/courses", tags=["courses"])
 app.include_router(classrooms_router, prefix="/api/classrooms", tags=["classrooms"])
 app.include_router(schedules_router, prefix="/api/schedules", tags=["schedules"])
+app.include_router(jobs_router, prefix="/api/schedule/jobs", tags=["jobs"])
+app.include_router(schedule_router, prefix="/api/schedule", tags=["schedule"])
+app.include_router(health_router, prefix="/api", tags=["health"])
 
 # API路由重定向
 @app.get("/api/{path:path}", include_in_schema=False)
@@ -64,40 +85,82 @@ async def read_path(path: str):
     raise HTTPException(status_code=404, detail="File not found")
 
 # 添加调度相关的API路由
+# 同步处理函数由线程池执行，排课计算不会阻塞事件循环；耗时较长的排课请使用 /api/schedule/jobs
 @app.post("/api/schedule/generate")
-async def generate_schedule(db: Session = Depends(get_db)):
-    scheduler = Scheduler(db)
-    schedule = scheduler.generate_schedule()
-    conflicts = scheduler.check_conflicts(schedule)
-    return {
-        "success": True,
-        "schedule": schedule,
-        "conflicts": conflicts
-    }
+def generate_schedule(params: ScheduleGenerateParams = Depends(), db: Session = Depends(get_db)):
+    try:
+        return run_generation(db, params)
+    except Exception as e:
+        return {"success": False, "error": f"自动排课失败: {str(e)}"}
+
+@app.post("/api/schedule/repair")
+def repair(request: ScheduleRepairRequest, db: Session = Depends(get_db)):
+    """教室或教师不可用时，只重新安排受影响的课程"""
+    if request.classroom_id is None and request.teacher_id is None:
+        raise HTTPException(status_code=400, detail="需要指定 classroom_id 或 teacher_id")
+    result = repair_schedule(
+        db,
+        classroom_id=request.classroom_id,
+        teacher_id=request.teacher_id,
+        unavailable_slots=[(slot.day, slot.period) for slot in request.unavailable_slots]
+    )
+    return {"success": True, **result}
 
 @app.post("/api/schedule/update")
-async def update_schedule(schedule_item: dict, db: Session = Depends(get_db)):
-    # 更新单个课程的时间安排
+async def update_schedule(schedule_item: ScheduleUpdateItem, db: AsyncSession = Depends(get_async_db)):
+    """
+    调整排课：带 id 时更新这条排课（未给出的字段保持不变），不带 id 时新增一条
+    冲突检查使用内存中的实时占用索引，与整张已提交的课表比较；并发写入由时间槽唯一约束兜底
+    """
+    fields = ("course_id", "teacher_id", "classroom_id", "day", "period")
     try:
-        # 检查是否存在冲突
-        scheduler = Scheduler(db)
-        conflicts = scheduler.check_conflicts([schedule_item])
+        schedule_id = schedule_item.id
+        if schedule_id is not None:
+            schedule = await db.get(Schedule, schedule_id)
+            if schedule is None:
+                return {"success": False, "error": "排课不存在"}
+            values = {field: getattr(schedule_item, field) for field in fields}
+            values = {field: getattr(schedule, field) if value is None else value for field, value in values.items()}
+        else:
+            schedule = None
+            values = {field: getattr(schedule_item, field) for field in fields}
+            missing = [field for field, value in values.items() if value is None]
+            if missing:
+                return {"success": False, "error": f"新增排课缺少字段: {missing}"}
+        # 未给出 day、period 时沿用原来的时间，原来的时间可能在网格之外
+        if not in_grid(values["day"], values["period"]):
+            return {"success": False, "error": f"时间不在周课表网格内: 周{values['day']}第{values['period']}节"}
+        # 引用的课程、教师、教室必须存在，否则外键错误会被当成时间冲突
+        for model, field, noun in ((Course, "course_id", "课程"), (Teacher, "teacher_id", "教师"),
+                                   (Classroom, "classroom_id", "教室")):
+            if await db.get(model, values[field]) is None:
+                return {"success": False, "error": f"{noun}不存在: {values[field]}"}
+
+        conflicts = (await db.run_sync(live_occupancy.check, [{**values, "id": schedule_id}]))[0]
         if conflicts:
             return {"success": False, "conflicts": conflicts}
-            
-        # 更新数据库中的排课记录
-        schedule = Schedule(
-            course_id=schedule_item["course_id"],
-            teacher_id=schedule_item["teacher_id"],
-            classroom_id=schedule_item["classroom_id"],
-            day=schedule_item["day"],
-            period=schedule_item["period"]
-        )
-        db.add(schedule)
-        db.commit()
-        return {"success": True}
+
+        if schedule is None:
+            schedule = Schedule(**values)
+            db.add(schedule)
+            deltas = {values["classroom_id"]: 1}
+        else:
+            deltas = Counter({schedule.classroom_id: -1})
+            deltas[values["classroom_id"]] += 1
+            for field, value in values.items():
+                setattr(schedule, field, value)
+        await db.run_sync(classroom_stats.apply_deltas, deltas)
+        schedule_changes.record(db, upserted=[schedule])
+        await db.commit()
+        return {"success": True, "schedule": {"id": schedule.id, **values}}
+    except IntegrityError:
+        await db.rollback()
+        return {"success": False, "conflicts": [{
+            "type": "time_conflict",
+            "message": "该时间段该教室或教师已被占用"
+        }]}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         return {"success": False, "error": str(e)}
 
 if __name__ == "__main__":
@@ -0,0 +1,31 @@
+import argparse
+import sys
+
+from app.config import engine, ensure_database
+from app.migrations import current_version, pending_migrations, run_migrations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="执行数据库迁移")
+    parser.add_argument("--target", type=int, default=None, help="只迁移到指定版本")
+    parser.add_argument("--status", action="store_true", help="只显示当前版本和待执行的迁移")
+    args = parser.parse_args()
+
+    ensure_database()
+    if args.status:
+        print(f"当前版本: {current_version(engine)}")
+        for module in pending_migrations(engine):
+            print(f"待执行: {module.VERSION} {module.DESCRIPTION}")
+        return
+
+    try:
+        done = run_migrations(engine, target=args.target)
+    except RuntimeError as e:
+        # 迁移前的数据检查失败（例如重复占用时间槽的排课），已执行的迁移保留
+        sys.exit(f"迁移中止: {e}")
+    if not done:
+        print(f"数据库已是最新版本 {current_version(engine)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from app.models.models import Teacher, Course, Classroom, Schedule
 from app.config import SessionLocal
+from app.services import classroom_stats
 
 def seed_data():
     db = SessionLocal()
@@ -58,6 +59,9 @@ def seed_data():
             Schedule(course_id=courses[2].id, teacher_id=teachers[0].id, classroom_id=classrooms[2].id, day=5, period=3)   # 周五第3节 程序设计基础
         ]
         db.add_all(schedules)
+        db.flush()
+        # 直接写入的课表，重新计算教室统计表
+        classroom_stats.rebuild(db)
         db.commit()
         
         print("测试数据添加成功！")
@@ -213,6 +213,46 @@ const api = {
         // 检查冲突
         checkConflicts: function() {
             return api.request('get', '/schedule/conflicts');
+        },
+
+        // 获取周课表网格，type 为 teachers / classrooms / buildings，
+        // params 如 { ids: [1, 2] }、{ department: '计算机学院' }、{ names: ['A'] }
+        timetable: function(type, params = {}) {
+            const query = new URLSearchParams();
+            Object.entries(params).forEach(([key, value]) => {
+                [].concat(value).forEach(item => query.append(key, item));
+            });
+            return api.request('get', `/schedule/timetable/${type}?${query}`);
+        },
+
+        // 批量检查候选位置是否冲突，candidates 为 [{ id, day, period, teacher_id, classroom_id }]
+        checkMoves: function(candidates) {
+            return api.request('post', '/schedule/check', { candidates });
+        },
+
+        // 拖动排课时所有可以放下的位置，params 如 { schedule_id: 1 } 或 { schedule_id: 1, classroom_id: 2 }
+        dropTargets: function(params) {
+            return api.request('get', '/schedule/drop-targets', null, params);
+        },
+
+        // 移动一条排课（带 id 时更新，不带 id 时新增）
+        move: function(item) {
+            return api.request('post', '/schedule/update', item);
+        },
+
+        // 批量移动、交换排课，operations 如 [{ op: 'move', id: 1, day: 2, period: 3 }, { op: 'swap', id: 4, other_id: 5 }]，
+        // 全部成功或全部不执行
+        batch: function(operations) {
+            return api.request('post', '/schedule/batch', { operations });
+        },
+
+        // 订阅课表变更推送，onChange 收到 { seq, inserted, updated, deleted } 或 { seq, reset: true }；
+        // 断线后浏览器自动重连并补发缺失的消息，返回的 EventSource 用 close() 取消订阅
+        subscribeChanges: function(onChange, since = null) {
+            const url = API_BASE_URL + '/schedule/changes' + (since === null ? '' : `?since=${since}`);
+            const source = new EventSource(url);
+            source.addEventListener('schedule', event => onChange(JSON.parse(event.data)));
+            return source;
         }
     }
 }; 
\ No newline at end of file